@@ -32,6 +32,15 @@ import inspect  # debug library
 from gramps.gen.filters import CustomFilters
 from gramps.gen.plug.menu import FilterOption
 from gramps.gen.plug import Gramplet
+from gramps.gen.display.name import displayer as name_displayer
+from template_filters import iter_apply, lookup, store
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+CHUNK_SIZE = 500  # people checked or listed between two idle calls
 
 
 class SampleGramplet(Gramplet):
@@ -40,11 +49,15 @@ class SampleGramplet(Gramplet):
         self.filter_list = CustomFilters.get_filters("Person")
         self.filter_index = 0
 
+    def db_changed(self):
+        self.connect(self.dbstate.db, "person-add", self.update)
+        self.connect(self.dbstate.db, "person-delete", self.update)
+        self.connect(self.dbstate.db, "person-update", self.update)
+
     def build_options(self):
         self.filter_option = FilterOption("Filter", self.filter_index)
         self.filter_option.set_filters(self.filter_list)
         self.add_option(self.filter_option)
-        self.print_filter_name()  # debug
 
     def on_load(self):
         if len(self.gui.data) > 0:
@@ -53,10 +66,58 @@ class SampleGramplet(Gramplet):
     def save_options(self):
         self.filter_index = self.filter_option.get_value()
         self.gui.data = [self.filter_index]
+        # restarting main() interrupts a run of the previous filter
+        self.update()
+
+    def main(self):
+        """
+        Apply the selected filter in the background.
+
+        main() is a generator: Gramplet.update() runs it from the GTK idle
+        loop, one chunk of people per step, so the UI stays responsive.
+        Selecting another filter calls update() again, which interrupts this
+        run and starts a new one.
+        """
+        self.set_text("")
+        if not self.filter_list or not self.dbstate.db.is_open():
+            return
         self.print_filter_name()  # debug
+        selected_filter = self.filter_list[self.filter_index]
+        db = self.dbstate.db
+        handles = list(db.iter_person_handles())
+        # a result cached by an earlier run, or by the Sample Report
+        matches = lookup(db, selected_filter)
+        if matches is None:
+            matches = []
+            yield from self.apply_filter(selected_filter, handles, matches)
+            store(db, selected_filter, matches)
+        for start in range(0, len(matches), CHUNK_SIZE):
+            lines = []
+            for handle in matches[start : start + CHUNK_SIZE]:
+                person = db.get_person_from_handle(handle)
+                lines.append(
+                    f"{person.get_gramps_id()} {name_displayer.display(person)}\n"
+                )
+            self.append_text("".join(lines))
+            yield True
+        self.append_text(f"{len(matches)} of {len(handles)} people match\n")
+
+    def apply_filter(self, selected_filter, handles, matches):
+        """
+        Check the people against the filter one chunk per step, adding the
+        handles that match to the matches list.
+        """
+        for done in iter_apply(
+            self.dbstate.db, selected_filter, handles, matches, CHUNK_SIZE
+        ):
+            self.uistate.push_message(
+                self.dbstate,
+                f"{selected_filter.get_name()}: {done} / {len(handles)}",
+            )
+            yield True
 
     def print_filter_name(self):
-        selected_filter = self.filter_option.get_filter()
+        selected_filter = self.filter_list[self.filter_index]
         self.append_text(
             f"Called from: {inspect.currentframe().f_back.f_code.co_name}\n"
         )  # debug: ID the function's name which calls this function
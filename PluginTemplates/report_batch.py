@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Run the Sample Report headless over many trees, sections and styles"""
+#
+# Each tree is opened once, read-only, and all its sections and styles are
+# run against it, sharing the filter results, the object cache and the
+# displayed names.  Trees are spread over a pool of worker processes, each
+# registering the plugins once.
+#
+# Usage:
+#   python3 PluginTemplates/report_batch.py jobs.json --workers 4 \
+#       --summary summary.json
+#
+# Job file:
+#   {
+#     "output": "/srv/reports",
+#     "jobs": [
+#       {
+#         "trees": ["Example Tree", "/path/to/tree/directory"],
+#         "sections": ["Associations", "Full List"],
+#         "styles": ["CSV file", "Table format"],
+#         "options": {"pid": "I0001", "off": "odt"}
+#       }
+#     ]
+#   }
+#
+# sections defaults to all sections, styles to "CSV file", options are
+# report options as given to the Gramps CLI.  Output goes to
+# <output>/<tree>/<section>-<style>.<extension>.
+#
+# ------------------------------------------------------------------------
+#
+# standard python modules
+#
+# ------------------------------------------------------------------------
+import argparse
+from collections import OrderedDict
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# ------------------------------------------------------------------------
+#
+# Gramps modules
+#
+# ------------------------------------------------------------------------
+from gramps.cli.clidbman import CLIDbManager
+from gramps.cli.plug import cl_report
+from gramps.gen.const import PLUGINS_DIR
+from gramps.gen.db.dbconst import DBMODE_R
+from gramps.gen.db.utils import make_database, get_dbid_from_path
+from gramps.gen.dbstate import DbState
+from gramps.gen.filters import reload_custom_filters
+from gramps.gen.plug import BasePluginManager
+from gramps.gen.plug.report import CATEGORY_TEXT
+from report_template import (
+    FILE_STYLES,
+    PROPERTY_ENTRY,
+    STYLE_ENTRY,
+    report_template,
+    report_templateOptions,
+    release_caches,
+    share_caches,
+)
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+DEFAULT_STYLES = [STYLE_ENTRY[2]]
+FILE_EXTENSIONS = {
+    STYLE_ENTRY[2]: ".csv",
+    STYLE_ENTRY[3]: ".tsv",
+    STYLE_ENTRY[4]: ".col",
+}
+
+_REGISTERED = False
+
+
+def _register_plugins():
+    global _REGISTERED
+    if not _REGISTERED:
+        BasePluginManager.get_instance().reg_plugins(PLUGINS_DIR, None, None)
+        # the report options list the custom filters, as in the Gramps CLI
+        reload_custom_filters()
+        _REGISTERED = True
+
+
+def _tree_path(tree):
+    """Directory of a tree given by its directory or by its name."""
+    if os.path.isdir(tree):
+        return tree
+    path = CLIDbManager(DbState()).get_family_tree_path(tree)
+    if path is None:
+        raise ValueError("unknown family tree %s" % tree)
+    return path
+
+
+def _open(tree):
+    path = _tree_path(tree)
+    database = make_database(get_dbid_from_path(path))
+    database.load(path, mode=DBMODE_R)
+    return database
+
+
+def _first_person_id(database):
+    person = database.get_default_person()
+    if person is None:
+        for handle in database.iter_person_handles():
+            person = database.get_person_from_handle(handle)
+            break
+    return person.get_gramps_id() if person else ""
+
+
+def _missing_output(report_options):
+    """The first output file of a run that was not written, or None."""
+    for key in ("of", "outfile"):
+        name = report_options.get(key)
+        if name and not (os.path.isfile(name) and os.path.getsize(name)):
+            return name
+    return None
+
+
+def load_jobs(path):
+    """
+    Read a job file. Returns an ordered dict of tree to the list of
+    (section, style, options) runs on the tree, and the output directory.
+    """
+    with open(path, encoding="utf-8") as source:
+        config = json.load(source)
+    runs = OrderedDict()
+    for job in config["jobs"]:
+        sections = job.get("sections", list(PROPERTY_ENTRY))
+        styles = job.get("styles", DEFAULT_STYLES)
+        for section in sections:
+            if section not in PROPERTY_ENTRY:
+                raise ValueError("unknown section %s" % section)
+        for style in styles:
+            if style not in STYLE_ENTRY:
+                raise ValueError("unknown style %s" % style)
+        for tree in job["trees"]:
+            for section in sections:
+                for style in styles:
+                    runs.setdefault(tree, []).append(
+                        (section, style, job.get("options", {}))
+                    )
+    return runs, config.get("output", "batch-output")
+
+
+def run_tree(args):
+    """Run all the reports of a tree. Returns the results of the runs."""
+    tree, runs, output, in_pool = args
+    _register_plugins()
+    start = time.perf_counter()
+    database = _open(tree)
+    opened = time.perf_counter() - start
+    outdir = os.path.join(output, os.path.basename(os.path.normpath(tree)))
+    os.makedirs(outdir, exist_ok=True)
+    results = []
+    share_caches(database)
+    try:
+        pid = _first_person_id(database)
+        for section, style, options in runs:
+            name = ("%s-%s" % (section, style)).replace(" ", "_")
+            report_options = {
+                "pid": pid,
+                "off": "txt",
+                "of": os.path.join(outdir, name + ".txt"),
+            }
+            report_options.update(options)
+            report_options["property"] = section
+            report_options["style"] = style
+            if style in FILE_STYLES:
+                report_options["outfile"] = os.path.join(
+                    outdir, name + FILE_EXTENSIONS[style]
+                )
+            if in_pool:
+                # pool processes can not start the report's own workers
+                report_options["workers"] = 1
+            report_options = {key: str(value) for key, value in report_options.items()}
+            for key in ("of", "outfile"):
+                if key in report_options and os.path.exists(report_options[key]):
+                    os.remove(report_options[key])
+            mark = time.perf_counter()
+            # cl_report prints the errors of the report and returns None
+            error = "the report failed"
+            try:
+                written = cl_report(
+                    database,
+                    "sample report",
+                    CATEGORY_TEXT,
+                    report_template,
+                    report_templateOptions,
+                    report_options,
+                )
+            except Exception as err:
+                written = None
+                error = str(err)
+            result = {
+                "tree": tree,
+                "section": section,
+                "style": style,
+                "status": "ok",
+                "seconds": time.perf_counter() - mark,
+                "document": report_options["of"],
+                "outfile": report_options.get("outfile"),
+            }
+            missing = _missing_output(report_options)
+            if written is None:
+                result.update(status="failed", error=error)
+            elif missing:
+                result.update(status="failed", error="%s was not written" % missing)
+            results.append(result)
+    finally:
+        release_caches(database)
+        database.close()
+    return {"tree": tree, "open_seconds": opened, "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("jobs", help="job file")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="number of trees run in parallel"
+    )
+    parser.add_argument("--summary", help="write the timings to this JSON file")
+    args = parser.parse_args()
+    try:
+        runs, output = load_jobs(args.jobs)
+    except (OSError, ValueError, KeyError) as err:
+        parser.error("%s: %s" % (args.jobs, err))
+
+    start = time.perf_counter()
+    in_pool = args.workers > 1 and len(runs) > 1
+    tasks = [(tree, tree_runs, output, in_pool) for tree, tree_runs in runs.items()]
+    if in_pool:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(min(args.workers, len(tasks))) as pool:
+            trees = list(pool.imap_unordered(run_tree, tasks))
+    else:
+        trees = [run_tree(task) for task in tasks]
+    failed = 0
+    for tree in trees:
+        print("%-40s open %8.2fs" % (tree["tree"], tree["open_seconds"]))
+        for run in tree["runs"]:
+            if run["status"] != "ok":
+                failed += 1
+                print(
+                    "    %-30s %-14s FAILED: %s"
+                    % (run["section"], run["style"], run["error"])
+                )
+                continue
+            print(
+                "    %-30s %-14s %8.2fs"
+                % (run["section"], run["style"], run["seconds"])
+            )
+    print("total %.2fs" % (time.perf_counter() - start))
+    if args.summary:
+        with open(args.summary, "w") as summary:
+            json.dump(
+                {"seconds": time.perf_counter() - start, "trees": trees},
+                summary,
+                indent=2,
+            )
+    if failed:
+        sys.exit("%d runs failed" % failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,9 +31,25 @@
 # standard python modules
 #
 # ------------------------------------------------------------------------
+from collections import namedtuple
 import math
+import cProfile
 import csv
+import hashlib
+import os
+import heapq
 import io
+import itertools
+import json
+import logging
+import multiprocessing
+from multiprocessing.util import Finalize
+import pickle
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
 
 # ------------------------------------------------------------------------
 #
@@ -41,10 +57,11 @@ import io
 #
 # ------------------------------------------------------------------------
 from gramps.gen.const import GRAMPS_LOCALE as glocale
+from gramps.gen.config import config
 
 _ = glocale.translation.gettext
 from gramps.gen.errors import ReportError
-from gramps.gen.lib import Person, Event, Media, Family, EventType
+from gramps.gen.lib import Date, EventType
 from gramps.gen.plug.docgen import (
     IndexMark,
     FontStyle,
@@ -67,51 +84,1551 @@ from gramps.gen.plug.menu import (
     FilterOption,
     PersonOption,
     BooleanOption,
+    DestinationOption,
 )
 from gramps.gen.plug.report import stdoptions
-from gramps.gen.proxy import CacheProxyDb
+from gramps.gen.db.dbconst import DBMODE_R
+from gramps.gen.db.utils import make_database, get_dbid_from_path
 from gramps.gen.display.name import displayer as _nd
-from gramps.gen.datehandler import get_date
+from gramps.gen.datehandler import displayer as _dd
 from gramps.gen.display.place import displayer as place_displayer
-from gramps.gen.utils.db import get_birth_or_fallback, get_death_or_fallback
 from gramps.gen.utils.alive import probably_alive, probably_alive_range
+from gramps.gen.utils.location import get_location_list
+from gramps.gen.utils.lru import LRU
 
 # import form
-from gramps.gen.const import PROGRAM_NAME, VERSION
+from gramps.gen.const import PROGRAM_NAME, VERSION, USER_HOME
+from template_cache import BoundedCacheDb, DEFAULT_SIZE, OBJECT_TYPES
+from template_columnar import ColumnarWriter
+from template_filters import apply_filter
+from template_raw import fields
 import time
 
+LOG = logging.getLogger(".report_template")
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+EMPTY_ENTRY = "_____________"
+#
+# List of available reports
+#
+PROPERTY_ENTRY = {
+    "Attributes with Values": ["Object", "ID", "Attribute", "Value", "Desc"],
+    "Associations": [
+        "Type",
+        "Person ID",
+        "Person",
+        "Associate ID",
+        "Associate",
+        "Citation ID",
+    ],
+    "Birth with Date and Location": [
+        "Location",
+        "Date",
+        "Person ID",
+        "Person",
+        "Primary + Secondary Citations",
+    ],
+    "Death with Date and Location": [
+        "Location",
+        "Date",
+        "Person ID",
+        "Person",
+        "Primary + Secondary Citations",
+    ],
+    "Full List": ["Person", "Birth Date", "Birth Location"],
+}
+#
+# List of output formats
+#
+STYLE_ENTRY = (
+    "Table format",
+    "CSV format",
+    "CSV file",
+    "TSV file",
+    "Columnar file",
+)
+FILE_STYLES = STYLE_ENTRY[2:]
+#
+# Field delimiter of the output formats written directly to a file
+#
+FILE_DELIMITER = {STYLE_ENTRY[2]: ",", STYLE_ENTRY[3]: "\t"}
+#
+# Width in percent of the table columns, by number of columns
+#
+TABLE_COLUMNS = {
+    3: (40, 30, 30),
+    5: (12, 8, 20, 25, 35),
+    6: (12, 8, 22, 8, 22, 28),
+}
+#
+# Write buffer of the output file
+#
+FILE_BUFFER = 1024 * 1024
+#
+# Objects scanned by the attribute report
+#
+ATTRIBUTE_SCOPE = "All objects", "Objects of filtered people"
+#
+# Order of the rows: the default order of the section, or a column
+#
+SORT_DEFAULT = "Default order"
+SORT_DIRECTION = "Ascending", "Descending"
+#
+# Event types the Birth and Death sections take their dates from, with the
+# fallbacks of get_birth_or_fallback and get_death_or_fallback
+#
+BIRTH_EVENTS = {EventType.BIRTH, EventType.BAPTISM, EventType.CHRISTEN}
+DEATH_EVENTS = {
+    EventType.DEATH,
+    EventType.BURIAL,
+    EventType.CREMATION,
+    EventType.CAUSE_DEATH,
+}
+#
+# Periods the Birth and Death sections can be grouped by, and their years
+#
+AGGREGATE_PERIODS = "Per person", "Year", "Decade", "Century"
+PERIOD_YEARS = {"Year": 1, "Decade": 10, "Century": 100}
+AGGREGATE_HEADERS = [
+    "Location",
+    "Period",
+    "People",
+    "Primary Citations",
+    "Secondary Citations",
+]
+#
+# Object types read more than once by each section, and by the person filter.
+# The other types are not cached when only re-read objects are cached.
+#
+SECTION_CACHED = {
+    "Attributes with Values": ("Person",),
+    "Associations": ("Person",),
+    "Birth with Date and Location": ("Place",),
+    "Death with Date and Location": ("Place",),
+    "Full List": (),
+}
+FILTER_CACHED = ("Person", "Family", "Event")
+#
+# Number of displayed names kept by the name cache
+#
+NAME_CACHE_SIZE = 50000
+#
+# Number of person and citation Gramps IDs kept by the ID resolver
+#
+ID_CACHE_SIZE = 100000
+#
+# Number of people whose events and places are loaded together
+#
+PREFETCH_BATCH = 500
+#
+# Number of chunks per worker process the filtered people are split into
+#
+WORKER_CHUNKS = 4
+#
+# Cache of the incremental mode, stored in the tree directory
+#
+INCREMENTAL_FILE = "sample_report_rows.sqlite"
+#
+# Cache of displayed names and place titles, stored in the tree directory
+#
+DISPLAY_FILE = "sample_report_display.sqlite"
+#
+# Version of the row records kept in the incremental cache
+#
+ROW_FORMAT = 2
+PLACE_MARKER = "<place>"
+#
+# Phases of a report run, timed for the Report Stats footer and the log
+#
+PHASE_FILTER = "filter apply"
+PHASE_SCAN = "cursor scan"
+PHASE_UNSERIALIZE = "unserialize"
+PHASE_LOOKUP = "event/place lookup"
+PHASE_NAMES = "name display"
+PHASE_SORT = "sort"
+PHASE_WRITE = "document write"
+PHASES = (
+    PHASE_FILTER,
+    PHASE_SCAN,
+    PHASE_UNSERIALIZE,
+    PHASE_LOOKUP,
+    PHASE_NAMES,
+    PHASE_SORT,
+    PHASE_WRITE,
+)
+#
+# Number of rows pickled together when a sorted run is spilled to disk
+#
+SPILL_BLOCK = 1000
+#
+# Name of the files of a split output: outfile name, part number, extension
+#
+PART_FILE = "%s-%03d%s"
+
+
+# ------------------------------------------------------------------------
+#
+# _PhaseTimer. Elapsed time and object counts of the phases of a run
+#
+# ------------------------------------------------------------------------
+class _PhaseTimer:
+    """
+    Accumulate the elapsed time and the number of objects of each phase of
+    a report run.  Only the work done in the report process is counted,
+    worker processes are not timed.
+    """
+
+    def __init__(self):
+        self.elapsed = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+
+    def add(self, phase, elapsed, count=0):
+        self.elapsed[phase] += elapsed
+        self.counts[phase] += count
+
+    def stats(self):
+        return {
+            phase: {
+                "seconds": round(self.elapsed[phase], 6),
+                "count": self.counts[phase],
+            }
+            for phase in PHASES
+        }
+
+
+def _scan(open_cursor, timer, batch_size=0, depth=0):
+    """
+    Yield the (handle, raw data) rows of the cursor returned by open_cursor,
+    timing the reads.  With a batch size and a queue depth the rows are read
+    ahead in a background thread, see _read_ahead.
+    """
+    if batch_size > 0 and depth > 0:
+        return _read_ahead(open_cursor, timer, batch_size, depth)
+    return _read(open_cursor(), timer)
+
+
+def _read(cursor, timer):
+    clock = time.perf_counter
+    count = 0
+    try:
+        start = clock()
+        data = cursor.first()
+        timer.add(PHASE_SCAN, clock() - start)
+        while data:
+            yield data
+            count += 1
+            start = clock()
+            data = cursor.next()
+            timer.add(PHASE_SCAN, clock() - start)
+    finally:
+        cursor.close()
+        timer.add(PHASE_SCAN, 0, count)
+
+
+_END = object()
+
+
+def _read_ahead(open_cursor, timer, batch_size, depth):
+    """
+    Read the rows of a cursor in a background thread, handing them over in
+    batches through a queue of depth batches, so the database is read while
+    the rows are processed.
+
+    Not every backend lets a connection be used from another thread
+    (SQLite does not); when the thread fails before any row was read, the
+    cursor is read in the calling thread instead.
+    """
+    batches = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            cursor = open_cursor()
+            try:
+                batch = []
+                # iterate, as first() and next() hide the errors of the backend
+                for data in cursor:
+                    batch.append(data)
+                    if len(batch) >= batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch and not put(batch):
+                    return
+            finally:
+                cursor.close()
+            put(_END)
+        except Exception as err:
+            put(err)
+
+    thread = threading.Thread(target=reader, name="read-ahead", daemon=True)
+    thread.start()
+    read = False
+    try:
+        while True:
+            start = time.perf_counter()
+            batch = batches.get()
+            timer.add(PHASE_SCAN, time.perf_counter() - start)
+            if batch is _END:
+                break
+            if isinstance(batch, Exception):
+                if read:
+                    raise batch
+                LOG.warning(
+                    "read-ahead not available, reading in the report: %s", batch
+                )
+                yield from _read(open_cursor(), timer)
+                break
+            read = True
+            timer.add(PHASE_SCAN, 0, len(batch))
+            yield from batch
+    finally:
+        stop.set()
+        thread.join()
+
+
+# ------------------------------------------------------------------------
+#
+# Row records. Sorted on their native values, formatted when written
+#
+# ------------------------------------------------------------------------
+_DATES = {}
+
+
+def _display_date(date):
+    """
+    Display a serialized date, or an empty string for no date. Displayed
+    dates are kept for the run, see _clear_dates.
+    """
+    if date is None:
+        return ""
+    text = _DATES.get(date)
+    if text is None:
+        text = _DATES[date] = _dd.display(Date().unserialize(date))
+    return text
+
+
+def _clear_dates():
+    """Forget the displayed dates, the date format may have changed."""
+    _DATES.clear()
+
+
+def _date_bounds(first_year, last_year):
+    """
+    Sort values of the first day of first_year and of the last day of
+    last_year; a year of 0 leaves that end of the range open.
+    """
+    low = Date(first_year, 1, 1).get_sort_value() if first_year else 1
+    high = Date(last_year, 12, 31).get_sort_value() if last_year else sys.maxsize
+    return low, high
+
+
+class _AttributeRow(namedtuple("_AttributeRow", "object id attribute value desc")):
+    __slots__ = ()
+    # field sorted on for each column
+    SORT_FIELDS = "object", "id", "attribute", "value", "desc"
+    # name and type of each column of the columnar file
+    COLUMNS = (
+        ("Object", "dict"),
+        ("ID", "str"),
+        ("Attribute", "dict"),
+        ("Value", "str"),
+        ("Desc", "str"),
+    )
+
+    def cells(self):
+        return self
+
+    def values(self):
+        return self
+
+
+class _AssociationRow(
+    namedtuple(
+        "_AssociationRow",
+        "type person_id person associate_id associate citation_id",
+    )
+):
+    __slots__ = ()
+    SORT_FIELDS = (
+        "type",
+        "person_id",
+        "person",
+        "associate_id",
+        "associate",
+        "citation_id",
+    )
+    COLUMNS = (
+        ("Type", "dict"),
+        ("Person ID", "str"),
+        ("Person", "str"),
+        ("Associate ID", "str"),
+        ("Associate", "str"),
+        ("Citation ID", "str"),
+    )
+
+    def cells(self):
+        return self
+
+    def values(self):
+        return self
+
+
+class _BirthDeathRow(
+    namedtuple(
+        "_BirthDeathRow",
+        "location sortval person_id person primary secondary date",
+    )
+):
+    """
+    Rows sort on the location, then on the date sort value, so the dates
+    are in chronological order whatever the display format.
+    """
+
+    __slots__ = ()
+    SORT_FIELDS = "location", "sortval", "person_id", "person", "primary"
+    COLUMNS = (
+        ("Location", "dict"),
+        ("Date", "str"),
+        ("Date Sort Value", "int"),
+        ("Person ID", "str"),
+        ("Person", "str"),
+        ("Primary Citations", "int"),
+        ("Secondary Citations", "int"),
+    )
+
+    def cells(self):
+        return (
+            self.location,
+            _display_date(self.date),
+            self.person_id,
+            self.person,
+            "{0} + {1}".format(self.primary, self.secondary),
+        )
+
+    def values(self):
+        return (
+            self.location,
+            _display_date(self.date),
+            self.sortval,
+            self.person_id,
+            self.person,
+            self.primary,
+            self.secondary,
+        )
+
+
+class _AggregateRow(
+    namedtuple(
+        "_AggregateRow",
+        "location start years count primary secondary",
+    )
+):
+    """People and citations of a place and period."""
+
+    __slots__ = ()
+    SORT_FIELDS = "location", "start", "count", "primary", "secondary"
+    COLUMNS = (
+        ("Location", "dict"),
+        ("Start Year", "int"),
+        ("Years", "int"),
+        ("People", "int"),
+        ("Primary Citations", "int"),
+        ("Secondary Citations", "int"),
+    )
+
+    def values(self):
+        return self
+
+    def cells(self):
+        period = str(self.start)
+        if self.years > 1:
+            period = "%d-%d" % (self.start, self.start + self.years - 1)
+        return (
+            self.location,
+            period,
+            str(self.count),
+            str(self.primary),
+            str(self.secondary),
+        )
+
+
+class _FullListRow(
+    namedtuple(
+        "_FullListRow",
+        "person birth_sortval death_sortval handle birth death",
+    )
+):
+    __slots__ = ()
+    SORT_FIELDS = "person", "birth_sortval", "death_sortval"
+    COLUMNS = (
+        ("Person", "str"),
+        ("Birth Date", "str"),
+        ("Birth Sort Value", "int"),
+        ("Death Date", "str"),
+        ("Death Sort Value", "int"),
+    )
+
+    def cells(self):
+        return (self.person, _display_date(self.birth), _display_date(self.death))
+
+    def values(self):
+        return (
+            self.person,
+            _display_date(self.birth),
+            self.birth_sortval,
+            _display_date(self.death),
+            self.death_sortval,
+        )
+
+
+# ------------------------------------------------------------------------
+#
+# _ExternalSorter. Sorts a stream of report rows without holding them all
+#
+# ------------------------------------------------------------------------
+class _ExternalSorter:
+    """
+    Sort report rows within a memory budget.
+
+    Rows are kept in memory until the budget is used up; the sorted run is
+    then spilled to a temporary file.  Iterating the sorter merges all the
+    runs, so only one block per run is in memory while the report is written.
+    """
+
+    def __init__(self, budget_mb, timer=None, key=None, reverse=False, limit=0):
+        """
+        key and reverse order the rows as for sorted(). With a limit, only
+        the first limit rows are kept, selected with a bounded heap.
+        """
+        self.__budget = max(1, budget_mb) * 1024 * 1024
+        self.__timer = timer if timer is not None else _PhaseTimer()
+        self.__key = key
+        self.__reverse = reverse
+        self.__limit = limit
+        self.__selected = False
+        self.__rows = []
+        self.__size = 0
+        self.__runs = []
+        self.count = 0
+
+    def add(self, row):
+        self.count += 1
+        self.__rows.append(row)
+        self.__size += sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+        if self.__size >= self.__budget:
+            self.__spill()
+
+    def extend(self, rows):
+        if self.__limit:
+            select = heapq.nlargest if self.__reverse else heapq.nsmallest
+            self.__rows = select(self.__limit, rows, key=self.__key)
+            self.__selected = True
+            self.count = len(self.__rows)
+            return self
+        for row in rows:
+            self.add(row)
+        return self
+
+    def __spill(self):
+        start = time.perf_counter()
+        self.__rows.sort(key=self.__key, reverse=self.__reverse)
+        run = tempfile.TemporaryFile()
+        for first in range(0, len(self.__rows), SPILL_BLOCK):
+            pickle.dump(
+                self.__rows[first : first + SPILL_BLOCK],
+                run,
+                pickle.HIGHEST_PROTOCOL,
+            )
+        run.seek(0)
+        self.__runs.append(run)
+        self.__timer.add(PHASE_SORT, time.perf_counter() - start, len(self.__rows))
+        self.__rows = []
+        self.__size = 0
+
+    @staticmethod
+    def __read_run(run):
+        while True:
+            try:
+                block = pickle.load(run)
+            except EOFError:
+                return
+            yield from block
+
+    def __iter__(self):
+        if self.__selected:
+            # already in order
+            return iter(self.__rows)
+        start = time.perf_counter()
+        self.__rows.sort(key=self.__key, reverse=self.__reverse)
+        self.__timer.add(PHASE_SORT, time.perf_counter() - start, len(self.__rows))
+        if not self.__runs:
+            return iter(self.__rows)
+        runs = [self.__read_run(run) for run in self.__runs]
+        return heapq.merge(self.__rows, *runs, key=self.__key, reverse=self.__reverse)
+
+    def close(self):
+        for run in self.__runs:
+            run.close()
+        self.__runs = []
+        self.__rows = []
+
+
+# ------------------------------------------------------------------------
+#
+# Table rows
+#
+# ------------------------------------------------------------------------
+def _table_style(columns):
+    """Name of the table style with the given number of columns."""
+    if columns == 5:
+        return "Sample-Attribute-Table"
+    return "Sample-Attribute-Table-%d" % columns
+
+
+def _write_table_rows(doc, rows, cell_style, paragraph_style):
+    """
+    Write rows of text cells, all with the same cell and paragraph style.
+    The document methods are looked up once for all the cells.
+    """
+    start_row, end_row = doc.start_row, doc.end_row
+    start_cell, end_cell = doc.start_cell, doc.end_cell
+    start_paragraph, end_paragraph = doc.start_paragraph, doc.end_paragraph
+    write_text = doc.write_text
+    for row in rows:
+        start_row()
+        for text in row:
+            start_cell(cell_style)
+            start_paragraph(paragraph_style)
+            write_text(text)
+            end_paragraph()
+            end_cell()
+        end_row()
+
+
+def _parts(rows, size):
+    """
+    Split the rows into parts of size rows, or a single part when size is 0.
+    Each part is an iterator that must be used up before the next one is
+    taken; there is always at least one part, which may be empty.
+    """
+    rows = iter(rows)
+    if not size:
+        yield rows
+        return
+    end = object()
+    first = next(rows, end)
+    if first is end:
+        yield iter(())
+        return
+    while first is not end:
+        yield itertools.chain((first,), itertools.islice(rows, size - 1))
+        first = next(rows, end)
+
+
+def _cells(rows, bounds):
+    """Yield the cells of the rows, keeping the first and last in bounds."""
+    for row in rows:
+        cells = row.cells()
+        if not bounds:
+            bounds.append(cells)
+        yield cells
+    if bounds:
+        bounds[1:] = [cells]
+
+
+# ------------------------------------------------------------------------
+#
+# _NameCache. Displayed person names shared by all report sections
+#
+# ------------------------------------------------------------------------
+class _NameCache:
+    """
+    Bounded LRU cache of displayed person names.
+
+    Names are keyed on the person handle and the current name format, so a
+    person heading many families or associated with many people is only
+    displayed once.
+    """
+
+    def __init__(
+        self, database, size=NAME_CACHE_SIZE, timer=None, cache=None, store=None
+    ):
+        self.__db = database
+        self.__timer = timer if timer is not None else _PhaseTimer()
+        self.__cache = cache if cache is not None else LRU(size)
+        self.__store = store
+        self.hits = 0
+        self.misses = 0
+
+    def __lookup(self, handle):
+        key = (handle, _nd.get_default_format())
+        if key in self.__cache:
+            self.hits += 1
+            return key, self.__cache[key]
+        self.misses += 1
+        return key, None
+
+    def display(self, person):
+        """Return the displayed name of a person object."""
+        key, name = self.__lookup(person.get_handle())
+        if name is None:
+            start = time.perf_counter()
+            name = self.__stored(person.get_handle(), person.get_change_time())
+            if name is None:
+                name = _nd.display(person)
+                self.__store_name(person.get_handle(), person.get_change_time(), name)
+            self.__timer.add(PHASE_NAMES, time.perf_counter() - start, 1)
+            self.__cache[key] = name
+        return name
+
+    def display_handle(self, handle):
+        """Return the displayed name of the person with the given handle."""
+        key, name = self.__lookup(handle)
+        if name is None:
+            if self.__store is not None:
+                # the stored name only needs the change time of the person
+                raw = self.__db.get_raw_person_data(handle)
+                return self.display_raw(handle, raw, fields("Person", raw), key)
+            start = time.perf_counter()
+            name = _nd.display(self.__db.get_person_from_handle(handle))
+            self.__timer.add(PHASE_NAMES, time.perf_counter() - start, 1)
+            self.__cache[key] = name
+        return name
+
+    def display_raw(self, handle, raw, person, key=None):
+        """
+        Return the displayed name of a serialized person, read with the
+        template_raw accessor person.
+        """
+        name = None
+        if key is None:
+            key, name = self.__lookup(handle)
+        if name is None:
+            start = time.perf_counter()
+            change = person.value(raw, "change")
+            name = self.__stored(handle, change)
+            if name is None:
+                name = _nd.display_name(person.primary_name(raw))
+                self.__store_name(handle, change, name)
+            self.__timer.add(PHASE_NAMES, time.perf_counter() - start, 1)
+            self.__cache[key] = name
+        return name
+
+    def __stored(self, handle, change):
+        if self.__store is None:
+            return None
+        return self.__store.get("name", handle, change)
+
+    def __store_name(self, handle, change, name):
+        if self.__store is not None:
+            self.__store.put("name", handle, change, name)
+
+    def log_stats(self):
+        LOG.debug(
+            "name cache: %d hits, %d misses, %d entries",
+            self.hits,
+            self.misses,
+            len(self.__cache.data),
+        )
+
+
+# ------------------------------------------------------------------------
+#
+# _IdResolver. Gramps IDs of persons and citations
+#
+# ------------------------------------------------------------------------
+class _IdResolver:
+    """
+    Bounded LRU cache of the Gramps IDs of persons and citations.
+
+    IDs are read from the serialized objects, and the handles of a batch are
+    fetched together in handle order, so a person or citation referenced
+    many times is only read once.
+    """
+
+    def __init__(self, database, size=ID_CACHE_SIZE, timer=None):
+        self.__timer = timer if timer is not None else _PhaseTimer()
+        self.__cache = LRU(size)
+        self.__raw = {
+            "Person": database.get_raw_person_data,
+            "Citation": database.get_raw_citation_data,
+        }
+
+    def fetch(self, obj_type, handles, names=None):
+        """
+        Read the IDs of the handles that are not cached yet. The names of
+        the persons read are also displayed into the _NameCache names, so
+        they are not read again for their names.
+        """
+        start = time.perf_counter()
+        missing = sorted(
+            handle for handle in handles if (obj_type, handle) not in self.__cache
+        )
+        for handle in missing:
+            raw = self.__raw[obj_type](handle)
+            gramps_id = ""
+            if raw is not None:
+                accessor = fields(obj_type, raw)
+                gramps_id = accessor.value(raw, "gramps_id")
+                if names is not None:
+                    names.display_raw(handle, raw, accessor)
+            self.__cache[(obj_type, handle)] = gramps_id
+        self.__timer.add(PHASE_LOOKUP, time.perf_counter() - start, len(missing))
+
+    def gramps_id(self, obj_type, handle):
+        key = (obj_type, handle)
+        if key in self.__cache:
+            return self.__cache[key]
+        gramps_id = self.__cache[key] = self.__read(obj_type, handle)
+        return gramps_id
+
+    def __read(self, obj_type, handle):
+        raw = self.__raw[obj_type](handle)
+        if raw is None:
+            return ""
+        return fields(obj_type, raw).value(raw, "gramps_id")
+
+
+# ------------------------------------------------------------------------
+#
+# _EventPlacePrefetch. Bulk loading of the events and places of people
+#
+# ------------------------------------------------------------------------
+class _EventPlacePrefetch:
+    """
+    Load the events and places of a batch of people together.
+
+    The distinct event handles of a batch are fetched once each, in handle
+    order, before the people are processed, and so are the places of the
+    events picked for the rows whose titles are not known yet.  Place
+    titles are computed once per place and year of the event date for the
+    whole run.
+    """
+
+    def __init__(self, database, timer=None, store=None):
+        self.__db = database
+        self.__timer = timer if timer is not None else _PhaseTimer()
+        self.__store = store
+        self.__events = {}
+        self.__places = {}
+        self.__titles = {}
+
+    def batches(self, handles, pick=None, level=0):
+        """
+        Yield lists of person objects with their events preloaded. pick
+        returns the event of a person whose place title is shown, with
+        level as given to place_title; None loads no places.
+        """
+        handles = list(handles)
+        for first in range(0, len(handles), PREFETCH_BATCH):
+            start = time.perf_counter()
+            batch = [
+                self.__db.get_person_from_handle(handle)
+                for handle in handles[first : first + PREFETCH_BATCH]
+            ]
+            self.__timer.add(PHASE_UNSERIALIZE, time.perf_counter() - start, len(batch))
+            start = time.perf_counter()
+            self.__load(batch, pick, level)
+            self.__timer.add(
+                PHASE_LOOKUP,
+                time.perf_counter() - start,
+                len(self.__events) + len(self.__places),
+            )
+            yield batch
+
+    def __load(self, people, pick, level):
+        event_handles = set()
+        for person in people:
+            event_handles.update(ref.ref for ref in person.get_event_ref_list())
+        self.__events = {}
+        for handle in sorted(event_handles):
+            event = self.__db.get_event_from_handle(handle)
+            if event:
+                self.__events[handle] = event
+        self.__places = {}
+        if pick is None:
+            return
+        place_handles = set()
+        for person in people:
+            event = pick(person)
+            if not event or not event.get_place_handle():
+                continue
+            date = event.get_date_object().to_calendar("gregorian")
+            if not (date and date.get_valid() and not date.is_empty()):
+                continue
+            key = (event.get_place_handle(), date.get_year(), level)
+            if key not in self.__titles:
+                place_handles.add(event.get_place_handle())
+        for handle in sorted(place_handles):
+            self.__places[handle] = self.__db.get_place_from_handle(handle)
+
+    def event(self, handle):
+        return self.__events.get(handle)
+
+    def birth_or_fallback(self, person):
+        """Same choice of event as get_birth_or_fallback, from the batch."""
+        birth_ref = person.get_birth_ref()
+        if birth_ref:
+            event = self.__events.get(birth_ref.ref)
+            if event:
+                return event
+        for event_ref in person.get_primary_event_ref_list():
+            event = self.__events.get(event_ref.ref)
+            if event and event.type.is_birth_fallback() and event_ref.role.is_primary():
+                return event
+        return None
+
+    def death_or_fallback(self, person):
+        """Same choice of event as get_death_or_fallback, from the batch."""
+        death_ref = person.get_death_ref()
+        if death_ref:
+            event = self.__events.get(death_ref.ref)
+            if event:
+                return event
+        for event_ref in person.get_primary_event_ref_list():
+            event = self.__events.get(event_ref.ref)
+            if event and event.type.is_death_fallback() and event_ref.role.is_primary():
+                return event
+        return None
+
+    def place_title(self, place_handle, date, level=0):
+        """
+        Return the title of the place as of the given date, or the names of
+        its level highest enclosing places when level is set. Titles are
+        cached by place and year, the hierarchy is walked once for each.
+        """
+        key = (place_handle, date.get_year(), level)
+        title = self.__titles.get(key)
+        if title is None:
+            start = time.perf_counter()
+            if self.__store is not None:
+                stored_key = "%s:%s:%s" % key
+                title = self.__store.get(
+                    "place", stored_key, self.__store.place_stamp()
+                )
+            if title is None:
+                place = self.__places.get(place_handle)
+                if place is None:
+                    place = self.__db.get_place_from_handle(place_handle)
+                title = ""
+                if place and level:
+                    names = get_location_list(self.__db, place, date)[-level:]
+                    title = ", ".join(name for name, place_type in names)
+                elif place:
+                    title = place_displayer.display(self.__db, place, date)
+                if self.__store is not None:
+                    self.__store.put(
+                        "place", stored_key, self.__store.place_stamp(), title
+                    )
+            self.__titles[key] = title
+            self.__timer.add(PHASE_LOOKUP, time.perf_counter() - start)
+        return title
+
+
+# ------------------------------------------------------------------------
+#
+# Citation counts of the events, from one scan of the event table
+#
+# ------------------------------------------------------------------------
+def _citation_counts(database, timer):
+    """
+    Return a dict of event handle to (event type value, number of
+    citations), read in one sequential scan of the events.
+    """
+    counts = {}
+    for handle, raw in _scan(database.get_event_cursor, timer):
+        event = fields("Event", raw)
+        counts[handle] = (
+            event.event_type(raw).value,
+            len(event.value(raw, "citation_list")),
+        )
+    return counts
+
+
+def _dated_people(database, people, event_types, dates, timer):
+    """
+    Return the people, in their order, with an event of one of the types
+    dated within dates, the lowest and highest date sort values. Events and
+    people are read in one scan each, from their serialized form, so the
+    people left out are never unserialized. The event a row takes its date
+    from is one of these, the rows still check its date.
+    """
+    low, high = dates
+    events = set()
+    for handle, raw in _scan(database.get_event_cursor, timer):
+        event = fields("Event", raw)
+        # the date is cheaper to check than the type
+        if low <= event.date_sortval(raw) <= high:
+            if event.event_type(raw).value in event_types:
+                events.add(handle)
+    scope = set(people)
+    dated = set()
+    for handle, raw in _scan(database.get_person_cursor, timer):
+        if handle in scope:
+            refs = fields("Person", raw).ref_handles(raw, "event_ref_list")
+            if not events.isdisjoint(refs):
+                dated.add(handle)
+    return [handle for handle in people if handle in dated]
+
+
+# ------------------------------------------------------------------------
+#
+# _PersonRows. Row generation for the sections that process filtered people
+#
+# ------------------------------------------------------------------------
+class _PersonRows:
+    """
+    Generate the rows of the Associations, Birth, Death and Full List
+    sections for a list of person handles.
+
+    Only reads the database, so the handle list may be split into chunks
+    that are processed by worker processes with their own connection.
+    """
+
+    def __init__(
+        self,
+        database,
+        property,
+        names=None,
+        timer=None,
+        citations=None,
+        display=None,
+        place_level=0,
+        dates=None,
+    ):
+        """
+        dates are the lowest and highest date sort values of the Birth,
+        Death and Full List rows, see _date_bounds; None keeps all dates.
+        """
+        self.database = database
+        self.property = property
+        self.display = display
+        self.place_level = place_level
+        self.dates = dates
+        self.timer = timer if timer is not None else _PhaseTimer()
+        self.names = names if names is not None else _NameCache(database)
+        self.citations = citations
+        self.ids = _IdResolver(database, timer=self.timer)
+
+    def rows(self, people, step=None):
+        """Yield the rows of the selected section, calling step per person."""
+        for handle, rows in self.grouped(people, step):
+            yield from rows
+
+    def grouped(self, people, step=None):
+        """
+        Yield a (person handle, rows) pair for every person, also for the
+        people that produce no rows.
+        """
+        property_keys = list(PROPERTY_ENTRY)
+        if step is None:
+            step = lambda: None
+        if self.property == property_keys[1]:
+            return self.__associations(people, step)
+        if self.property in (property_keys[2], property_keys[3]):
+            return self.__birth_death(people, step)
+        return self.__full_list(people, step)
+
+    def __associations(self, people, step):
+        #
+        #    The associates and the last citation of every association of a
+        #    batch of people are resolved together
+        #
+        people = list(people)
+        for first in range(0, len(people), PREFETCH_BATCH):
+            start = time.perf_counter()
+            batch = [
+                self.database.get_person_from_handle(handle)
+                for handle in people[first : first + PREFETCH_BATCH]
+            ]
+            self.timer.add(PHASE_UNSERIALIZE, time.perf_counter() - start, len(batch))
+            associates = set()
+            citations = set()
+            for person in batch:
+                for assoc in person.get_person_ref_list():
+                    associates.add(assoc.ref)
+                    if assoc.get_citation_list():
+                        citations.add(assoc.get_citation_list()[-1])
+            self.ids.fetch("Person", associates, self.names)
+            self.ids.fetch("Citation", citations)
+            for person in batch:
+                step()
+                rows = []
+                for assoc in person.get_person_ref_list():
+                    cit_id = ""
+                    if assoc.get_citation_list():
+                        cit_id = self.ids.gramps_id(
+                            "Citation", assoc.get_citation_list()[-1]
+                        )
+                    rows.append(
+                        _AssociationRow(
+                            assoc.get_relation(),
+                            person.get_gramps_id(),
+                            self.names.display(person),
+                            self.ids.gramps_id("Person", assoc.ref),
+                            self.names.display_handle(assoc.ref),
+                            cit_id,
+                        )
+                    )
+                yield person.get_handle(), rows
+
+    def __birth_death(self, people, step):
+        for person, details in self.__birth_death_events(people, step):
+            if details is None:
+                yield person.get_handle(), []
+                continue
+            bd_event, bd_date, place_title, primary_cit, secondary_cit = details
+            row = _BirthDeathRow(
+                place_title,
+                bd_date.get_sort_value(),
+                person.get_gramps_id(),
+                self.names.display(person),
+                primary_cit,
+                secondary_cit,
+                bd_event.get_date_object().serialize(),
+            )
+            yield person.get_handle(), [row]
+
+    def aggregated(self, people, step, years):
+        """
+        Yield one row per place and period of years of the Birth or Death
+        section, counting the people and their citations. Only the totals
+        of each group are kept, no row is built per person.
+        """
+        groups = {}
+        for person, details in self.__birth_death_events(people, step):
+            if details is None:
+                continue
+            bd_event, bd_date, place_title, primary_cit, secondary_cit = details
+            key = (place_title, bd_date.get_year() // years * years)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0, 0]
+            group[0] += 1
+            group[1] += primary_cit
+            group[2] += secondary_cit
+        for (place_title, start), (count, primary, secondary) in groups.items():
+            yield _AggregateRow(place_title, start, years, count, primary, secondary)
+
+    def __birth_death_events(self, people, step):
+        """
+        Yield (person, details) for every person, details being None when
+        the person has no event with a valid date and a place, else
+        (event, gregorian date, place title, primary and secondary citations).
+        """
+        property_keys = list(PROPERTY_ENTRY)
+        if self.property == property_keys[2]:
+            primary_event = [EventType.BIRTH]
+            secondary_event = [EventType.CHRISTEN, EventType.BAPTISM]
+        elif self.property == property_keys[3]:
+            primary_event = [EventType.DEATH]
+            secondary_event = [
+                EventType.BURIAL,
+                EventType.CREMATION,
+                EventType.CAUSE_DEATH,
+            ]
+        if self.citations is None:
+            self.citations = _citation_counts(self.database, self.timer)
+        prefetch = _EventPlacePrefetch(self.database, self.timer, self.display)
+        if self.property == property_keys[2]:
+            pick = prefetch.birth_or_fallback
+        else:
+            pick = prefetch.death_or_fallback
+        for batch in prefetch.batches(people, pick, self.place_level):
+            for person in batch:
+                step()
+                bd_event = pick(person)
+                if not bd_event or not bd_event.get_place_handle():
+                    yield person, None
+                    continue
+                bd_date = bd_event.get_date_object().to_calendar("gregorian")
+                if not (bd_date and bd_date.get_valid() and not bd_date.is_empty()):
+                    yield person, None
+                    continue
+                if not self.__in_dates(bd_date.get_sort_value()):
+                    yield person, None
+                    continue
+                #    Get the Place title based on the date of the event
+                place_title = prefetch.place_title(
+                    bd_event.get_place_handle(), bd_date, self.place_level
+                )
+                if not place_title:
+                    yield person, None
+                    continue
+                primary_cit = 0
+                secondary_cit = 0
+                for event_ref in person.get_primary_event_ref_list():
+                    if event_ref and event_ref.role.is_primary():
+                        event_type, count = self.citations.get(event_ref.ref, (None, 0))
+                        if event_type in primary_event:
+                            primary_cit += count
+                        if event_type in secondary_event:
+                            secondary_cit += count
+                yield person, (
+                    bd_event,
+                    bd_date,
+                    place_title,
+                    primary_cit,
+                    secondary_cit,
+                )
+
+    def __in_dates(self, sortval):
+        """
+        Whether a date sort value is in the date range. Dates that are not
+        valid have a sort value of 0, below any range.
+        """
+        if self.dates is None:
+            return True
+        low, high = self.dates
+        return low <= sortval <= high
+
+    def __full_list(self, people, step):
+        #
+        #    Traverse Person list
+        #
+
+        prefetch = _EventPlacePrefetch(self.database, self.timer, self.display)
+        for batch in prefetch.batches(people):
+            for person in batch:
+                step()
+                birth = death = None
+                birth_sortval = death_sortval = 0
+                bd_event_birth = prefetch.birth_or_fallback(person)
+                bd_event_death = prefetch.death_or_fallback(person)
+                if bd_event_birth:
+                    birth = bd_event_birth.get_date_object()
+                    birth_sortval = birth.get_sort_value()
+                    birth = birth.serialize()
+                if bd_event_death:
+                    death = bd_event_death.get_date_object()
+                    death_sortval = death.get_sort_value()
+                    death = death.serialize()
+                if not self.__in_dates(birth_sortval):
+                    yield person.get_handle(), []
+                    continue
+                row = _FullListRow(
+                    self.names.display(person),
+                    birth_sortval,
+                    death_sortval,
+                    person.get_handle(),
+                    birth,
+                    death,
+                )
+                yield person.get_handle(), [row]
+
+
+def _display_settings():
+    """The settings the displayed names, dates and places depend on."""
+    return (
+        _nd.get_default_format(),
+        config.get("preferences.date-format"),
+        config.get("preferences.place-format"),
+        glocale.lang,
+    )
+
+
+# ------------------------------------------------------------------------
+#
+# _DisplayCache. Displayed names and place titles of the previous runs
+#
+# ------------------------------------------------------------------------
+class _DisplayCache:
+    """
+    Displayed strings kept in a SQLite file in the tree directory, shared by
+    all runs and sections of the report.
+
+    Strings are keyed on their kind, the object handle and the display
+    settings, and are valid for one change time of the object.  A place
+    title depends on the whole place hierarchy, so place titles are valid
+    for the latest change time of all places.
+    """
+
+    def __init__(self, database):
+        self.__db = database
+        self.__config = hashlib.sha1(
+            repr(_display_settings()).encode("utf-8")
+        ).hexdigest()
+        self.__pending = []
+        self.__place_stamp = None
+        path = os.path.join(database.get_save_path(), DISPLAY_FILE)
+        try:
+            self.__conn = sqlite3.connect(path)
+            self.__conn.execute(
+                "CREATE TABLE IF NOT EXISTS display (config TEXT, kind TEXT, "
+                "handle TEXT, change INTEGER, text TEXT, "
+                "PRIMARY KEY (config, kind, handle))"
+            )
+        except sqlite3.Error as err:
+            raise ReportError(_("Could not open the cache %s") % path, str(err))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, handle, change):
+        """Return the stored string, or None when missing or outdated."""
+        found = self.__conn.execute(
+            "SELECT change, text FROM display "
+            "WHERE config = ? AND kind = ? AND handle = ?",
+            (self.__config, kind, handle),
+        ).fetchone()
+        if found is not None and found[0] == change:
+            self.hits += 1
+            return found[1]
+        self.misses += 1
+        return None
+
+    def put(self, kind, handle, change, text):
+        self.__pending.append((self.__config, kind, handle, change, text))
+
+    def place_stamp(self):
+        """Latest change time of all places, read once per run."""
+        if self.__place_stamp is None:
+            self.__place_stamp = 0
+            cursor = self.__db.get_place_cursor()
+            data = cursor.first()
+            while data:
+                change = fields("Place", data[1]).value(data[1], "change")
+                self.__place_stamp = max(self.__place_stamp, change)
+                data = cursor.next()
+            cursor.close()
+        return self.__place_stamp
+
+    def commit(self):
+        self.__conn.executemany(
+            "INSERT OR REPLACE INTO display VALUES (?, ?, ?, ?, ?)", self.__pending
+        )
+        self.__conn.commit()
+        self.__pending = []
+        LOG.debug("display cache: %d hits, %d misses", self.hits, self.misses)
+
+    def close(self):
+        self.__conn.close()
+
+
 # ------------------------------------------------------------------------
 #
-# Constants
+# _IncrementalCache. Rows of the previous runs, stored next to the tree
 #
 # ------------------------------------------------------------------------
-EMPTY_ENTRY = "_____________"
+class _IncrementalCache:
+    """
+    Per person rows of the previous runs of a section.
+
+    Rows are keyed on the person handle and its change time, for the
+    section and the display settings they were formatted with.  A person is
+    regenerated when its change time moved, when it is new, or when one of
+    the events, citations or associates its rows were built from changed
+    since the previous run.  A changed place invalidates all rows that show
+    a place, as the title depends on the whole place hierarchy.
+    """
+
+    def __init__(self, database, property, place_level=0, dates=None):
+        self.__db = database
+        self.__property = property
+        self.__start = int(time.time())
+        settings = (property, ROW_FORMAT, place_level, dates) + _display_settings()
+        self.__config = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()
+        path = os.path.join(database.get_save_path(), INCREMENTAL_FILE)
+        try:
+            self.__conn = sqlite3.connect(path)
+            self.__conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (config TEXT, handle TEXT, "
+                "change INTEGER, rows BLOB, PRIMARY KEY (config, handle))"
+            )
+            self.__conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs "
+                "(config TEXT PRIMARY KEY, stamp INTEGER)"
+            )
+        except sqlite3.Error as err:
+            raise ReportError(_("Could not open the cache %s") % path, str(err))
+        stamp = self.__conn.execute(
+            "SELECT stamp FROM runs WHERE config = ?", (self.__config,)
+        ).fetchone()
+        self.__stamp = stamp[0] if stamp else None
+        self.__changes = {}
+        self.__clean = set()
+
+    def __changed(self, cursor, obj_type):
+        """Return the handles of a table changed since the previous run."""
+        changed = set()
+        data = cursor.first()
+        while data:
+            if fields(obj_type, data[1]).value(data[1], "change") >= self.__stamp:
+                changed.add(data[0])
+            data = cursor.next()
+        cursor.close()
+        return changed
+
+    def __dependencies(self, raw, person):
+        property_keys = list(PROPERTY_ENTRY)
+        if self.__property == property_keys[1]:
+            deps = []
+            for handle, citations in person.person_refs(raw):
+                deps.append(handle)
+                deps.extend(citations)
+            return deps
+        deps = person.ref_handles(raw, "event_ref_list")
+        if self.__property in (property_keys[2], property_keys[3]):
+            deps.append(PLACE_MARKER)
+        return deps
+
+    def dirty(self, people):
+        """
+        Return the filtered people whose rows have to be regenerated, in the
+        order of the filter. Cached rows of the people outside the filter,
+        deleted or not, are dropped: their dependencies are not checked, so
+        the rows could be stale when the people are back in the filter.
+        """
+        changed = set()
+        if self.__stamp is not None:
+            changed = self.__changed(self.__db.get_event_cursor(), "Event")
+            changed |= self.__changed(self.__db.get_citation_cursor(), "Citation")
+            if self.__changed(self.__db.get_place_cursor(), "Place"):
+                changed.add(PLACE_MARKER)
+        cached = dict(
+            self.__conn.execute(
+                "SELECT handle, change FROM rows WHERE config = ?", (self.__config,)
+            )
+        )
+        scope = set(people)
+        dropped = set(cached) - scope
+        dirty = set()
+        deps = {}
+        cursor = self.__db.get_person_cursor()
+        data = cursor.first()
+        while data:
+            handle, raw = data
+            person = fields("Person", raw)
+            change = person.value(raw, "change")
+            if self.__stamp is not None and change >= self.__stamp:
+                changed.add(handle)
+            if handle in scope:
+                if cached.get(handle) != change:
+                    dirty.add(handle)
+                    self.__changes[handle] = change
+                else:
+                    deps[handle] = self.__dependencies(raw, person)
+            data = cursor.next()
+        cursor.close()
+        for handle, person_deps in deps.items():
+            if not changed.isdisjoint(person_deps):
+                dirty.add(handle)
+                self.__changes[handle] = cached[handle]
+        self.__conn.executemany(
+            "DELETE FROM rows WHERE config = ? AND handle = ?",
+            [(self.__config, handle) for handle in dropped],
+        )
+        self.__clean = scope - dirty
+        LOG.debug(
+            "incremental: %d people regenerated, %d from cache",
+            len(dirty),
+            len(self.__clean),
+        )
+        return [handle for handle in people if handle in dirty]
+
+    def store(self, handle, rows):
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)",
+            (
+                self.__config,
+                handle,
+                self.__changes[handle],
+                pickle.dumps(rows, pickle.HIGHEST_PROTOCOL),
+            ),
+        )
+
+    def cached_rows(self, step):
+        """Yield the cached rows of the people that did not change."""
+        for handle, rows in self.__conn.execute(
+            "SELECT handle, rows FROM rows WHERE config = ?", (self.__config,)
+        ):
+            if handle in self.__clean:
+                step()
+                yield from pickle.loads(rows)
+
+    def commit(self):
+        """Record this run; the next one compares against its start time."""
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?)", (self.__config, self.__start)
+        )
+        self.__conn.commit()
+
+    def close(self):
+        self.__conn.close()
+
+
+# ------------------------------------------------------------------------
 #
-# List of available reports
+# Worker processes. Each opens its own read-only connection to the tree
 #
-PROPERTY_ENTRY = {
-    "Attributes with Values": ["Object", "ID", "Attribute", "Value", "Desc"],
-    "Associations": ["Type", "Person ID", "Person", "Associate ID", "Associate"],
-    "Birth with Date and Location": [
-        "Location",
-        "Date",
-        "Person ID",
-        "Person",
-        "Primary + Secondary Citations",
-    ],
-    "Death with Date and Location": [
-        "Location",
-        "Date",
-        "Person ID",
-        "Person",
-        "Primary + Secondary Citations",
-    ],
-    "Full List": ["Person", "Birth Date", "Birth Location"],
-}
+# ------------------------------------------------------------------------
+_WORKER_DB = None
+_WORKER_CITATIONS = None
+
+
+def _worker_init(path, citations, cache_sizes):
+    """
+    Open the tree read-only in a worker process. The citation counts are
+    built once by the report and inherited by the forked workers.
+    """
+    global _WORKER_DB, _WORKER_CITATIONS
+    _WORKER_CITATIONS = citations
+    database = make_database(get_dbid_from_path(path))
+    database.load(path, mode=DBMODE_R)
+    Finalize(None, database.close, exitpriority=10)
+    _WORKER_DB = BoundedCacheDb(database, cache_sizes)
+
+
+def _worker_rows(args):
+    property, place_level, dates, people, grouped = args
+    person_rows = _PersonRows(
+        _WORKER_DB,
+        property,
+        citations=_WORKER_CITATIONS,
+        place_level=place_level,
+        dates=dates,
+    )
+    if grouped:
+        return list(person_rows.grouped(people)), len(people)
+    return sorted(person_rows.rows(people)), len(people)
+
+
+# ------------------------------------------------------------------------
 #
-# List of output formats
+# Caches shared by the runs of a batch on the same tree
 #
-STYLE_ENTRY = "Table format", "CSV format"
+# ------------------------------------------------------------------------
+_SHARED = {}
+
+
+def share_caches(database):
+    """
+    Let the following runs of the report on the database share their object
+    cache, displayed names and citation counts, until release_caches.
+
+    The caches are not refreshed when the database changes, so this is
+    only meant for batch runs on a tree opened read-only.  Filter results
+    are always shared, see template_filters.
+    """
+    _SHARED.setdefault(database, {})
+
+
+def release_caches(database):
+    _SHARED.pop(database, None)
+
 
 # ------------------------------------------------------------------------
 #
@@ -132,14 +1649,56 @@ class report_template(Report):
         #
         self.property = mgobn("property")
         self.style = mgobn("style")
+        self.outfile = mgobn("outfile")
         self.titletext = mgobn("titletext")
+        self.part_rows = mgobn("partrows")
+        self.index_page = mgobn("indexpage")
+        self.attr_scope = mgobn("attrscope")
+        self.limit = mgobn("limit")
+        self.sort_column = mgobn("sortkey")
+        self.sort_direction = mgobn("sortdirection")
+        self.aggregate = mgobn("aggregate")
+        self.place_level = mgobn("placelevel")
+        self.date_from = mgobn("datefrom")
+        self.date_to = mgobn("dateto")
+        self.sort_memory = mgobn("sortmemory")
+        self.workers = mgobn("workers")
+        self.incremental = mgobn("incremental")
+        self.cache_size = mgobn("cachesize")
+        self.cache_reread = mgobn("cachereread")
+        self.display_cache = mgobn("displaycache")
+        self.read_batch = mgobn("readbatch")
+        self.read_depth = mgobn("readdepth")
+        self.profile_file = mgobn("profilefile")
         self.filter_option = menu.get_option_by_name("filter")
         self.filter = self.filter_option.get_filter()
         pid = mgobn("pid")
         self.center_person = self.database.get_person_from_gramps_id(pid)
         if self.center_person is None:
             raise ReportError(_("Person %s is not in the Database") % pid)
-        self.database = CacheProxyDb(self.database)
+        self.__shared = _SHARED.get(self.database)
+        names = None
+        if self.__shared is None:
+            self.database = BoundedCacheDb(self.database, self.__cache_sizes())
+        else:
+            if "database" not in self.__shared:
+                self.__shared["database"] = BoundedCacheDb(
+                    self.database, self.__cache_sizes()
+                )
+                self.__shared["names"] = LRU(NAME_CACHE_SIZE)
+            self.database = self.__shared["database"]
+            names = self.__shared["names"]
+        self.__timer = _PhaseTimer()
+        self.__display = None
+        if self.display_cache:
+            self.__display = _DisplayCache(self.database)
+        self.__names = _NameCache(
+            self.database, timer=self.__timer, cache=names, store=self.__display
+        )
+        _clear_dates()
+        self.__citations = None
+        if self.__shared is not None:
+            self.__citations = self.__shared.get("citations")
         #
         # Initialize the footer
         #
@@ -149,28 +1708,77 @@ class report_template(Report):
     # Overarrching Report writer. It selects which spscific report is requested.
     #
     def write_report(self):
+        profiler = None
+        if self.profile_file:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            self.__write_report()
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(self.profile_file)
+            if self.__display is not None:
+                self.__display.commit()
+                self.__display.close()
+            self.__names.log_stats()
+            LOG.info(
+                "object cache: %s",
+                json.dumps(self.database.stats()),
+                extra={"cache": self.database.stats()},
+            )
+            LOG.info(
+                "%s: %s",
+                self.property,
+                json.dumps(self.__timer.stats()),
+                extra={"phases": self.__timer.stats()},
+            )
+
+    def __write_report(self):
         property_keys = list(PROPERTY_ENTRY)
         #
         # Select which report based on user selection
         #
         if self.property == property_keys[0]:
-            reportRows = self.__process_attributes()
+            rowSource = self.__process_attributes()
         elif self.property == property_keys[1]:
-            reportRows = self.__process_associations()
+            rowSource = self.__process_associations()
         elif self.property == property_keys[2]:
-            reportRows = self.__process_birth_death()
+            rowSource = self.__process_birth_death()
         elif self.property == property_keys[3]:
-            reportRows = self.__process_birth_death()
+            rowSource = self.__process_birth_death()
         elif self.property == property_keys[4]:
-            reportRows = self.__process_full_list()
+            rowSource = self.__process_full_list()
 
         #
-        # Select output format based on user selection
+        # Rows are generated one at a time and sorted within the memory budget
         #
-        if self.style == STYLE_ENTRY[0]:
-            self.__write_report_table(reportRows)
-        if self.style == STYLE_ENTRY[1]:
-            self.__write_report_csv(reportRows)
+        reportRows = _ExternalSorter(
+            self.sort_memory,
+            self.__timer,
+            key=self.__sort_key(),
+            reverse=self.sort_direction == SORT_DIRECTION[1],
+            limit=self.limit,
+        )
+        try:
+            reportRows.extend(rowSource)
+            #
+            # Select output format based on user selection
+            #
+            start = time.perf_counter()
+            if self.style == STYLE_ENTRY[0]:
+                self.__write_report_table(reportRows)
+            if self.style == STYLE_ENTRY[1]:
+                self.__write_report_csv(reportRows)
+            if self.style in FILE_DELIMITER:
+                self.__write_report_file(reportRows, FILE_DELIMITER[self.style])
+            if self.style == STYLE_ENTRY[4]:
+                self.__write_report_columnar(reportRows)
+            self.__timer.add(PHASE_WRITE, time.perf_counter() - start, reportRows.count)
+            if self.style == STYLE_ENTRY[0]:
+                self.__write_meta()
+        finally:
+            reportRows.close()
 
     #
     # The report prefix for this report is Sample.
@@ -182,284 +1790,445 @@ class report_template(Report):
         mark = IndexMark(title, INDEX_TYPE_TOC, 1)
         self.doc.write_text(_(self.titletext), mark)
         self.doc.end_paragraph()
-        self.doc.start_table("Attributes", "Sample-Attribute-Table")
-        headers = PROPERTY_ENTRY.get(self.property)
-        self.doc.start_row()
-        for i in range(len(headers)):
-            self.doc.start_cell("Sample-Attribute-TableCell")
-            self.doc.start_paragraph("Sample-Attribute-Normal-Bold")
-            self.doc.write_text(_(headers[i]))
-            self.doc.end_paragraph()
-            self.doc.end_cell()
-        self.doc.end_row()
-        for reportRow in reportRowsSorted:
+        headers = self.__headers()
+        index = []
+        for number, part in enumerate(_parts(reportRowsSorted, self.part_rows), 1):
+            if self.part_rows:
+                #
+                # Each part is a table of its own, on its own page
+                #
+                if number > 1:
+                    self.doc.page_break()
+                heading = _("Part %d") % number
+                self.doc.start_paragraph("Sample-Attribute-Part")
+                self.doc.write_text(heading, IndexMark(heading, INDEX_TYPE_TOC, 2))
+                self.doc.end_paragraph()
+            self.doc.start_table("Attributes", _table_style(len(headers)))
             self.doc.start_row()
-            for i in range(len(reportRow)):
+            for i in range(len(headers)):
                 self.doc.start_cell("Sample-Attribute-TableCell")
-                self.doc.start_paragraph("Sample-Attribute-Normal")
-                self.doc.write_text(reportRow[i])
+                self.doc.start_paragraph("Sample-Attribute-Normal-Bold")
+                self.doc.write_text(_(headers[i]))
                 self.doc.end_paragraph()
                 self.doc.end_cell()
             self.doc.end_row()
-        self.doc.end_table()
-        self.__write_meta()
+            bounds = []
+            _write_table_rows(
+                self.doc,
+                _cells(part, bounds),
+                "Sample-Attribute-TableCell",
+                "Sample-Attribute-Normal",
+            )
+            self.doc.end_table()
+            index.append((heading if self.part_rows else "", bounds))
+        if self.part_rows and self.index_page:
+            self.__write_index(index)
+
+    def __write_index(self, index):
+        """Index page: the first and last row of every part."""
+        self.doc.page_break()
+        title = _("Index")
+        self.doc.start_paragraph("Sample-Attribute-Part")
+        self.doc.write_text(title, IndexMark(title, INDEX_TYPE_TOC, 2))
+        self.doc.end_paragraph()
+        for heading, bounds in index:
+            self.doc.start_paragraph("Sample-Attribute-Normal")
+            if bounds:
+                first, last = bounds
+                self.doc.write_text(
+                    "%s: %s, %s - %s, %s"
+                    % (heading, first[0], first[1], last[0], last[1])
+                )
+            else:
+                self.doc.write_text(heading)
+            self.doc.end_paragraph()
 
     def __write_report_csv(self, reportRowsSorted):
 
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(_(PROPERTY_ENTRY.get(self.property)))
-        for reportRow in reportRowsSorted:
-            writer.writerow(reportRow)
+        for part in _parts(reportRowsSorted, self.part_rows):
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(_(self.__headers()))
+            for reportRow in part:
+                writer.writerow(reportRow.cells())
+            self.doc.start_paragraph("Sample-Attribute-Normal")
+            self.doc.write_text(output.getvalue())
+            self.doc.end_paragraph()
+
+    def __part_files(self, reportRowsSorted):
+        """
+        Yield (file name, rows) for every output file: the outfile itself,
+        or one numbered file per part when the output is split.
+        """
+        root, ext = os.path.splitext(self.outfile)
+        for number, part in enumerate(_parts(reportRowsSorted, self.part_rows), 1):
+            if self.part_rows:
+                yield PART_FILE % (root, number, ext), part
+            else:
+                yield self.outfile, part
+
+    def __write_files_note(self, names):
         self.doc.start_paragraph("Sample-Attribute-Normal")
-        self.doc.write_text(output.getvalue())
+        for name in names:
+            self.doc.write_text(_("Report rows written to %s") % name)
+            if len(names) > 1:
+                self.doc.write_text("\n")
         self.doc.end_paragraph()
 
+    def __write_report_file(self, reportRowsSorted, delimiter):
+        """
+        Stream the rows straight to the output file through a buffered
+        writer; only a note with the file name goes into the document.
+        """
+        headers = self.__headers()
+        names = []
+        for name, part in self.__part_files(reportRowsSorted):
+            try:
+                with open(
+                    name, "w", newline="", encoding="utf-8", buffering=FILE_BUFFER
+                ) as output:
+                    writer = csv.writer(output, delimiter=delimiter)
+                    writer.writerow([_(header) for header in headers])
+                    writer.writerows(row.cells() for row in part)
+            except OSError as err:
+                raise ReportError(_("Could not write %s") % name, str(err))
+            names.append(name)
+        self.__write_files_note(names)
+
+    def __write_report_columnar(self, reportRowsSorted):
+        """
+        Stream the rows to a columnar file, read back with
+        template_columnar.read_columns. Counts and date sort values are
+        written as int columns.
+        """
+        columns = list(self.__row_type().COLUMNS)
+        names = []
+        for name, part in self.__part_files(reportRowsSorted):
+            try:
+                with open(name, "wb", buffering=FILE_BUFFER) as output:
+                    writer = ColumnarWriter(output, columns)
+                    writer.writerows(row.values() for row in part)
+                    writer.close()
+            except OSError as err:
+                raise ReportError(_("Could not write %s") % name, str(err))
+            names.append(name)
+        self.__write_files_note(names)
+
     def __process_attributes(self):
-        reportRows = []
+        #
+        #    Only the fields needed for the rows are read from each serialized
+        #    object, through the template_raw accessors. Full objects are
+        #    never built.
+        #
+        scope = None
+        if self.attr_scope == ATTRIBUTE_SCOPE[1]:
+            scope = set(self.__apply_filter())
+            families = set()
+            events = set()
+            media = set()
         #
         #    Traverse Person list
         #
-        cursor = self.database.get_person_cursor()
-
-        data = cursor.first()
-        while data:
-            person = Person()
-            person.unserialize(data[1])
-            attrs = person.get_attribute_list()
-            for attr in attrs:
-                if attr.get_type() != "_UID":
-                    reportRows.append(
-                        [
+        for handle, raw in self.__scan(self.database.get_person_cursor):
+            if scope is None or handle in scope:
+                person = fields("Person", raw)
+                if scope is not None:
+                    families.update(person.value(raw, "family_list"))
+                    events.update(person.ref_handles(raw, "event_ref_list"))
+                    media.update(person.ref_handles(raw, "media_list"))
+                name = None
+                for attr_type, value in person.attributes(raw):
+                    if attr_type != "_UID":
+                        if name is None:
+                            name = self.__names.display_raw(handle, raw, person)
+                        yield _AttributeRow(
                             "Person",
-                            person.get_gramps_id(),
-                            attr.get_type().type2base(),
-                            attr.get_value(),
-                            _nd.display(person),
-                        ]
-                    )
-            data = cursor.next()
-        cursor.close()
+                            person.value(raw, "gramps_id"),
+                            attr_type.type2base(),
+                            value,
+                            name,
+                        )
         #
         #    Traverse Family list
         #
-        cursor = self.database.get_family_cursor()
-
-        data = cursor.first()
-        while data:
-            family = Family()
-            family.unserialize(data[1])
-            attrs = family.get_attribute_list()
-            for attr in attrs:
-                mother = ""
-                father = ""
-                if family.get_mother_handle() is not None:
-                    mother = _nd.display(
-                        self.database.get_person_from_handle(family.get_mother_handle())
-                    )
-                if family.get_father_handle() is not None:
-                    father = _nd.display(
-                        self.database.get_person_from_handle(family.get_father_handle())
-                    )
-                if attr.get_type() != "_UID":
-                    reportRows.append(
-                        [
+        for handle, raw in self.__scan(self.database.get_family_cursor):
+            if scope is None or handle in families:
+                family = fields("Family", raw)
+                if scope is not None:
+                    events.update(family.ref_handles(raw, "event_ref_list"))
+                    media.update(family.ref_handles(raw, "media_list"))
+                parents = None
+                for attr_type, value in family.attributes(raw):
+                    if attr_type != "_UID":
+                        if parents is None:
+                            mother = ""
+                            father = ""
+                            mother_handle = family.value(raw, "mother_handle")
+                            father_handle = family.value(raw, "father_handle")
+                            if mother_handle is not None:
+                                mother = self.__names.display_handle(mother_handle)
+                            if father_handle is not None:
+                                father = self.__names.display_handle(father_handle)
+                            parents = father + " / " + mother
+                        yield _AttributeRow(
                             "Family",
-                            family.get_gramps_id(),
-                            attr.get_type().type2base(),
-                            attr.get_value(),
-                            father + " / " + mother,
-                        ]
-                    )
-            data = cursor.next()
-        cursor.close()
+                            family.value(raw, "gramps_id"),
+                            attr_type.type2base(),
+                            value,
+                            parents,
+                        )
         #
         #    Traverse Event list
         #
-        cursor = self.database.get_event_cursor()
-
-        data = cursor.first()
-        while data:
-            event = Event()
-            event.unserialize(data[1])
-            attrs = event.get_attribute_list()
-            etype = event.get_type()
-            for attr in attrs:
-                reportRows.append(
-                    [
+        for handle, raw in self.__scan(self.database.get_event_cursor):
+            if scope is None or handle in events:
+                event = fields("Event", raw)
+                if scope is not None:
+                    media.update(event.ref_handles(raw, "media_list"))
+                attributes = event.attributes(raw)
+                if attributes:
+                    etype = event.event_type(raw)
+                for attr_type, value in attributes:
+                    yield _AttributeRow(
                         "Event - " + etype.string,
-                        event.get_gramps_id(),
-                        attr.get_type().type2base(),
-                        attr.get_value(),
-                        event.get_description(),
-                    ]
-                )
-            data = cursor.next()
-        cursor.close()
+                        event.value(raw, "gramps_id"),
+                        attr_type.type2base(),
+                        value,
+                        event.value(raw, "description"),
+                    )
         #
         #    Traverse Media list
         #
-        cursor = self.database.get_media_cursor()
-
-        data = cursor.first()
-        while data:
-            media = Media()
-            media.unserialize(data[1])
-            attrs = media.get_attribute_list()
-            for attr in attrs:
-                reportRows.append(
-                    [
+        for handle, raw in self.__scan(self.database.get_media_cursor):
+            if scope is None or handle in media:
+                medium = fields("Media", raw)
+                for attr_type, value in medium.attributes(raw):
+                    yield _AttributeRow(
                         "Media",
-                        media.get_gramps_id(),
-                        attr.get_type().type2base(),
-                        attr.get_value(),
-                        media.get_description(),
-                    ]
-                )
-            data = cursor.next()
-        cursor.close()
+                        medium.value(raw, "gramps_id"),
+                        attr_type.type2base(),
+                        value,
+                        medium.value(raw, "desc"),
+                    )
 
-        reportRowsSorted = sorted(reportRows, reverse=False)
-        return reportRowsSorted
+    def __sort_key(self):
+        """
+        Key ordering the rows on the selected column, with the default
+        order between equal values; None for the default order.
+        """
+        if not self.sort_column:
+            return None
+        column = self.sort_column - 1
 
-    def __process_associations(self):
-        reportRows = []
+        def key(row):
+            if column < len(row.SORT_FIELDS):
+                return getattr(row, row.SORT_FIELDS[column]), row
+            return None, row
+
+        return key
+
+    def __scan(self, open_cursor):
+        return _scan(open_cursor, self.__timer, self.read_batch, self.read_depth)
+
+    def __apply_filter(self):
+        """
+        Handles of the filtered people. The result is shared with other
+        reports and the Sample Gramplet until the database changes.
+        The filters built for the center person carry its ID in their rules,
+        so it is part of the filter definition in the cache key.
+        """
+        start = time.perf_counter()
+        people = apply_filter(self.database, self.filter, user=self._user)
+        self.__timer.add(PHASE_FILTER, time.perf_counter() - start, len(people))
+        return people
+
+    def __dated_people(self, people):
+        """The people that may have a date in the date range, if one is set."""
+        dates = self.__date_bounds()
+        if dates is None:
+            return people
+        start = time.perf_counter()
+        event_types = BIRTH_EVENTS
+        if self.property == list(PROPERTY_ENTRY)[3]:
+            event_types = DEATH_EVENTS
+        dated = _dated_people(self.database, people, event_types, dates, self.__timer)
+        LOG.debug(
+            "date range: %d of %d people in %.2fs",
+            len(dated),
+            len(people),
+            time.perf_counter() - start,
+        )
+        return dated
+
+    def __process_people(self, title):
         #
         #    Traverse Person list
         #
-        people = self.database.iter_person_handles()
-        people = self.filter.apply(self.database, people, user=self._user)
+        people = self.__dated_people(self.__apply_filter())
         with self._user.progress(
-            _("Associations Report"), _("Processing Filtered Persons..."), len(people)
+            title, _("Processing Filtered Persons..."), len(people)
         ) as step:
-            for person_handle in people:
-                step()
-                person = self.database.get_person_from_handle(person_handle)
-                for assoc in person.get_person_ref_list():
-                    associate = self.database.get_person_from_handle(assoc.ref)
-                    cit_id = ""
-                    if assoc.get_citation_list():
-                        for citation_handle in assoc.get_citation_list():
-                            citation = self.database.get_citation_from_handle(
-                                citation_handle
-                            )
-                            cit_id = citation.get_gramps_id()
-                    reportRows.append(
-                        [
-                            assoc.get_relation(),
-                            person.get_gramps_id(),
-                            _nd.display(person),
-                            associate.get_gramps_id(),
-                            _nd.display(associate),
-                            cit_id,
-                        ]
-                    )
-        reportRowsSorted = sorted(reportRows, reverse=False)
-        return reportRowsSorted
+            if self.incremental:
+                yield from self.__process_people_incremental(people, step)
+            elif self.__parallel(people):
+                results = self.__process_people_parallel(people, step, False)
+                yield from heapq.merge(*results)
+            else:
+                person_rows = self.__person_rows()
+                yield from person_rows.rows(people, step)
 
-    def __process_birth_death(self):
-        reportRows = []
-        #
-        #    Traverse Person list
-        #
+    def __process_people_incremental(self, people, step):
+        """
+        Regenerate the rows of the people that changed since the previous
+        run, and take the rows of all other people from the cache.
+        """
+        cache = _IncrementalCache(
+            self.database, self.property, self.place_level, self.__date_bounds()
+        )
+        try:
+            dirty = cache.dirty(people)
+            if self.__parallel(dirty):
+                results = self.__process_people_parallel(dirty, step, True)
+                grouped = (pair for result in results for pair in result)
+            else:
+                person_rows = self.__person_rows()
+                grouped = person_rows.grouped(dirty, step)
+            for handle, rows in grouped:
+                cache.store(handle, rows)
+                yield from rows
+            yield from cache.cached_rows(step)
+            cache.commit()
+        finally:
+            cache.close()
+
+    def __cache_sizes(self):
+        """Cached objects per object type, for the selected section."""
+        if not self.cache_reread:
+            return dict.fromkeys(OBJECT_TYPES, self.cache_size)
+        cached = set(SECTION_CACHED[self.property])
+        if (
+            self.property != list(PROPERTY_ENTRY)[0]
+            or self.attr_scope == ATTRIBUTE_SCOPE[1]
+        ):
+            cached.update(FILTER_CACHED)
+        return {
+            obj_type: self.cache_size if obj_type in cached else 0
+            for obj_type in OBJECT_TYPES
+        }
+
+    def __person_rows(self):
+        return _PersonRows(
+            self.database,
+            self.property,
+            self.__names,
+            self.__timer,
+            self.__citation_counts(),
+            self.__display,
+            self.place_level,
+            self.__date_bounds(),
+        )
 
+    def __citation_counts(self):
+        """
+        Citation counts of the events, used by the Birth and Death sections.
+        Built once per run and shared with the worker processes.
+        """
         property_keys = list(PROPERTY_ENTRY)
-        people = self.database.iter_person_handles()
-        people = self.filter.apply(self.database, people, user=self._user)
-        with self._user.progress(
-            _("Birth / Death Report"), _("Processing Filtered Persons..."), len(people)
-        ) as step:
-            for person_handle in people:
-                step()
-                person = self.database.get_person_from_handle(person_handle)
-                bd_event = None
-                if self.property == property_keys[2]:
-                    bd_event = get_birth_or_fallback(self.database, person)
-                    primary_event = [EventType.BIRTH]
-                    secondary_event = [EventType.CHRISTEN, EventType.BAPTISM]
-                elif self.property == property_keys[3]:
-                    bd_event = get_death_or_fallback(self.database, person)
-                    primary_event = [EventType.DEATH]
-                    secondary_event = [
-                        EventType.BURIAL,
-                        EventType.CREMATION,
-                        EventType.CAUSE_DEATH,
-                    ]
-                if bd_event:
-                    place_handle = bd_event.get_place_handle()
-                    if place_handle:
-                        place = self.database.get_place_from_handle(place_handle)
-                        if place:
-                            bd_date = bd_event.get_date_object().to_calendar(
-                                "gregorian"
-                            )
-                            #    Get the Place title based on the date of the event
-                            place_title = place_displayer.display(
-                                self.database, place, bd_date
-                            )
-                            if place_title != "":
-                                primary_cit = 0
-                                secondary_cit = 0
-                                for event_ref in person.get_primary_event_ref_list():
-                                    if event_ref:
-                                        event = self.database.get_event_from_handle(
-                                            event_ref.ref
-                                        )
-                                        if event and event_ref.role.is_primary():
-                                            if event.type in primary_event:
-                                                primary_cit += len(
-                                                    event.get_citation_list()
-                                                )
-                                            if event.type in secondary_event:
-                                                secondary_cit += len(
-                                                    event.get_citation_list()
-                                                )
-                                cits = "{0} + {1}".format(primary_cit, secondary_cit)
-                                if (
-                                    bd_date
-                                    and bd_date.get_valid()
-                                    and not bd_date.is_empty()
-                                ):
-                                    date_str = "%s" % get_date(bd_event)
-                                    reportRows.append(
-                                        [
-                                            place_title,
-                                            date_str,
-                                            person.get_gramps_id(),
-                                            _nd.display(person),
-                                            cits,
-                                        ]
-                                    )
-
-        reportRowsSorted = sorted(reportRows, reverse=False)
-        return reportRowsSorted
+        if self.__citations is None and self.property in property_keys[2:4]:
+            self.__citations = _citation_counts(self.database, self.__timer)
+            if self.__shared is not None:
+                self.__shared["citations"] = self.__citations
+        return self.__citations
 
-    def __process_full_list(self):
-        reportRows = []
+    def __parallel(self, people):
+        if self.workers > 1 and len(people) > self.workers:
+            if "fork" in multiprocessing.get_all_start_methods():
+                return True
+            LOG.warning("worker processes are not supported on this platform")
+        return False
+
+    def __process_people_parallel(self, people, step, grouped):
+        """
+        Split the people into chunks processed by a pool of worker processes.
+        Returns the sorted rows of each chunk, or the (handle, rows) pairs
+        when grouped.
+        """
+        size = math.ceil(len(people) / (self.workers * WORKER_CHUNKS))
+        chunks = [
+            (
+                self.property,
+                self.place_level,
+                self.__date_bounds(),
+                people[start : start + size],
+                grouped,
+            )
+            for start in range(0, len(people), size)
+        ]
+        results = []
+        context = multiprocessing.get_context("fork")
+        with context.Pool(
+            self.workers,
+            _worker_init,
+            (
+                self.database.get_save_path(),
+                self.__citation_counts(),
+                self.__cache_sizes(),
+            ),
+        ) as pool:
+            for rows, count in pool.imap_unordered(_worker_rows, chunks):
+                for dummy in range(count):
+                    step()
+                results.append(rows)
+        return results
+
+    def __process_associations(self):
+        return self.__process_people(_("Associations Report"))
+
+    def __process_birth_death(self):
+        if self.aggregate in PERIOD_YEARS:
+            return self.__process_aggregated(_("Birth / Death Report"))
+        return self.__process_people(_("Birth / Death Report"))
+
+    def __process_aggregated(self, title):
         #
-        #    Traverse Person list
+        #    Group the filtered people by place and period, in the report
+        #    process; worker processes and the incremental cache are not used
         #
-
-        people = self.database.iter_person_handles()
-        people = self.filter.apply(self.database, people, user=self._user)
+        people = self.__dated_people(self.__apply_filter())
         with self._user.progress(
-            _("Full List Report"), _("Processing Filtered Persons..."), len(people)
+            title, _("Processing Filtered Persons..."), len(people)
         ) as step:
-            for person_handle in people:
-                step()
-                date_str_birth = ""
-                date_str_death = ""
-                person = self.database.get_person_from_handle(person_handle)
-                bd_event_birth = get_birth_or_fallback(self.database, person)
-                bd_event_death = get_death_or_fallback(self.database, person)
-                if bd_event_birth:
-                    date_str_birth = "%s" % get_date(bd_event_birth)
-                if bd_event_death:
-                    date_str_death = "%s" % get_date(bd_event_death)
-                reportRows.append([_nd.display(person), date_str_birth, date_str_death])
+            yield from self.__person_rows().aggregated(
+                people, step, PERIOD_YEARS[self.aggregate]
+            )
+
+    def __date_bounds(self):
+        """
+        Sort values bounding the dates of the Birth, Death and Full List
+        sections, None when no date range is set.
+        """
+        if self.property not in list(PROPERTY_ENTRY)[2:5]:
+            return None
+        if not self.date_from and not self.date_to:
+            return None
+        return _date_bounds(self.date_from, self.date_to)
+
+    def __row_type(self):
+        if self.__headers() is AGGREGATE_HEADERS:
+            return _AggregateRow
+        row_types = (_AttributeRow, _AssociationRow, _BirthDeathRow, _BirthDeathRow)
+        return dict(zip(PROPERTY_ENTRY, row_types + (_FullListRow,)))[self.property]
+
+    def __headers(self):
+        if (
+            self.aggregate in PERIOD_YEARS
+            and self.property in list(PROPERTY_ENTRY)[2:4]
+        ):
+            return AGGREGATE_HEADERS
+        return PROPERTY_ENTRY.get(self.property)
 
-        reportRowsSorted = sorted(reportRows, reverse=False)
-        return reportRowsSorted
+    def __process_full_list(self):
+        return self.__process_people(_("Full List Report"))
 
     def __init_meta(self, options_class):
         #
@@ -470,6 +2239,7 @@ class report_template(Report):
         self.footer_date = mgobn("footerdate")
         self.footer_version = mgobn("footerversion")
         self.footer_tree = mgobn("footertree")
+        self.footer_stats = mgobn("footerstats")
 
     #
     # output footer if selected
@@ -482,6 +2252,18 @@ class report_template(Report):
             self.doc.write_text("Gramps Version: %s \n" % VERSION)
         if self.footer_tree:
             self.doc.write_text("Gramps Tree: %s \n" % self.database.get_dbname())
+        if self.footer_stats:
+            stats = self.__timer.stats()
+            for phase in PHASES:
+                self.doc.write_text(
+                    "%s: %.3f s, %d \n"
+                    % (phase, stats[phase]["seconds"], stats[phase]["count"])
+                )
+            for obj_type, cache in self.database.stats().items():
+                self.doc.write_text(
+                    "%s cache: %d hits, %d misses, %d evictions \n"
+                    % (obj_type, cache["hits"], cache["misses"], cache["evictions"])
+                )
         self.doc.end_paragraph()
 
 
@@ -501,10 +2283,31 @@ class report_templateOptions(MenuReportOptions):
         self.__filter = None
         self.__sel1_option = None
         self.__sel2_option = None
+        self.__outfile = None
+        self.__attrscope = None
+        self.__sortkey = None
+        self.__sortdirection = None
+        self.__limit = None
+        self.__aggregate = None
+        self.__placelevel = None
+        self.__datefrom = None
+        self.__dateto = None
         self.__titletext = None
+        self.__partrows = None
+        self.__indexpage = None
+        self.__sortmemory = None
+        self.__workers = None
+        self.__incremental = None
+        self.__profile_file = None
+        self.__cachesize = None
+        self.__cachereread = None
+        self.__displaycache = None
+        self.__readbatch = None
+        self.__readdepth = None
         self.__footer_date = None
         self.__footer_version = None
         self.__footer_tree = None
+        self.__footer_stats = None
         MenuReportOptions.__init__(self, name, dbase)
 
     def get_subject(self):
@@ -545,11 +2348,197 @@ class report_templateOptions(MenuReportOptions):
         self.__sel2_option.set_help(_("Style of report"))
         menu.add_option(category_name, "style", self.__sel2_option)
 
+        self.__outfile = DestinationOption(
+            _("Output file"), os.path.join(USER_HOME, "sample_report.csv")
+        )
+        self.__outfile.set_help(_("File written by the file formats"))
+        self.__outfile.set_directory_entry(False)
+        menu.add_option(category_name, "outfile", self.__outfile)
+
+        self.__attrscope = EnumeratedListOption(
+            _("Attribute objects"), ATTRIBUTE_SCOPE[0]
+        )
+        for i in range(len(ATTRIBUTE_SCOPE)):
+            self.__attrscope.add_item(ATTRIBUTE_SCOPE[i], ATTRIBUTE_SCOPE[i])
+        self.__attrscope.set_help(
+            _(
+                "Scan every object, or only the families, events and media "
+                "reachable from the filtered people"
+            )
+        )
+        menu.add_option(category_name, "attrscope", self.__attrscope)
+        self.__attrscope.connect("value-changed", self.__property_changed)
+
+        self.__sortkey = EnumeratedListOption(_("Sort by"), 0)
+        self.__set_sort_columns()
+        self.__sortkey.set_help(_("Column the rows are ordered on"))
+        menu.add_option(category_name, "sortkey", self.__sortkey)
+
+        self.__sortdirection = EnumeratedListOption(
+            _("Sort direction"), SORT_DIRECTION[0]
+        )
+        for i in range(len(SORT_DIRECTION)):
+            self.__sortdirection.add_item(SORT_DIRECTION[i], _(SORT_DIRECTION[i]))
+        self.__sortdirection.set_help(_("Order of the rows"))
+        menu.add_option(category_name, "sortdirection", self.__sortdirection)
+
+        self.__limit = NumberOption(_("Maximum rows"), 0, 0, 10000000)
+        self.__limit.set_help(
+            _(
+                "Only keep the first rows in the selected order, for example "
+                "the earliest births. 0 keeps all rows."
+            )
+        )
+        menu.add_option(category_name, "limit", self.__limit)
+
+        self.__aggregate = EnumeratedListOption(
+            _("Group by period"), AGGREGATE_PERIODS[0]
+        )
+        for i in range(len(AGGREGATE_PERIODS)):
+            self.__aggregate.add_item(AGGREGATE_PERIODS[i], _(AGGREGATE_PERIODS[i]))
+        self.__aggregate.set_help(
+            _(
+                "Birth and Death: one row per place and period with the number "
+                "of people and citations, instead of one row per person"
+            )
+        )
+        menu.add_option(category_name, "aggregate", self.__aggregate)
+
+        self.__placelevel = NumberOption(_("Place levels"), 0, 0, 10)
+        self.__placelevel.set_help(
+            _(
+                "Birth and Death: show only this many of the highest levels of "
+                "the place hierarchy, for example 1 for the country. "
+                "0 shows the full place title."
+            )
+        )
+        menu.add_option(category_name, "placelevel", self.__placelevel)
+
+        self.__datefrom = NumberOption(_("From year"), 0, 0, 9999)
+        self.__datefrom.set_help(
+            _(
+                "Birth, Death and Full List: leave out the dates before this "
+                "year, and the people without a valid date. 0 for no limit."
+            )
+        )
+        menu.add_option(category_name, "datefrom", self.__datefrom)
+
+        self.__dateto = NumberOption(_("To year"), 0, 0, 9999)
+        self.__dateto.set_help(
+            _(
+                "Birth, Death and Full List: leave out the dates after this "
+                "year, and the people without a valid date. 0 for no limit."
+            )
+        )
+        menu.add_option(category_name, "dateto", self.__dateto)
+        self.__aggregate.connect("value-changed", self.__set_sort_columns)
+        self.__aggregate_changed()
+
         category_name = _("Table Options")
         self.__titletext = StringOption(_("Title text"), _("Title text"))
         self.__titletext.set_help(_("Title of report"))
         menu.add_option(category_name, "titletext", self.__titletext)
 
+        self.__partrows = NumberOption(_("Rows per part"), 0, 0, 1000000)
+        self.__partrows.set_help(
+            _(
+                "Split the output into tables or files of this many rows, "
+                "each with its own headers. 0 writes a single table or file."
+            )
+        )
+        menu.add_option(category_name, "partrows", self.__partrows)
+
+        self.__indexpage = BooleanOption(_("Index page"), False)
+        self.__indexpage.set_help(
+            _("Add a page with the first and last row of every part of the table")
+        )
+        menu.add_option(category_name, "indexpage", self.__indexpage)
+        self.__sel2_option.connect("value-changed", self.__style_changed)
+        self.__style_changed()
+
+        category_name = _("Performance")
+        self.__sortmemory = NumberOption(_("Sort memory budget (MB)"), 64, 1, 4096)
+        self.__sortmemory.set_help(
+            _("Memory used to sort rows before sorted runs are spilled to disk")
+        )
+        menu.add_option(category_name, "sortmemory", self.__sortmemory)
+
+        self.__workers = NumberOption(_("Worker processes"), 1, 1, 64)
+        self.__workers.set_help(
+            _(
+                "Number of processes that generate the rows of the sections "
+                "using the person filter. Each worker opens the tree read-only."
+            )
+        )
+        menu.add_option(category_name, "workers", self.__workers)
+
+        self.__incremental = BooleanOption(_("Incremental update"), False)
+        self.__incremental.set_help(
+            _(
+                "Keep the rows of each person in a cache next to the tree and "
+                "only regenerate the people that changed since the previous run. "
+                "Used by the sections with a person filter."
+            )
+        )
+        menu.add_option(category_name, "incremental", self.__incremental)
+
+        self.__cachesize = NumberOption(
+            _("Cached objects per type"), DEFAULT_SIZE, 0, 1000000
+        )
+        self.__cachesize.set_help(
+            _(
+                "Maximum number of objects of each type kept in memory once "
+                "read; the least recently used are dropped first. 0 disables "
+                "the cache."
+            )
+        )
+        menu.add_option(category_name, "cachesize", self.__cachesize)
+
+        self.__cachereread = BooleanOption(_("Cache only re-read objects"), False)
+        self.__cachereread.set_help(
+            _(
+                "Only cache the object types the selected section and the "
+                "person filter read more than once"
+            )
+        )
+        menu.add_option(category_name, "cachereread", self.__cachereread)
+
+        self.__displaycache = BooleanOption(_("Keep displayed names"), False)
+        self.__displaycache.set_help(
+            _(
+                "Keep the displayed names and place titles in a cache next to "
+                "the tree, reused by later runs until the objects change. "
+                "Not used by worker processes."
+            )
+        )
+        menu.add_option(category_name, "displaycache", self.__displaycache)
+
+        self.__readbatch = NumberOption(_("Read-ahead batch size"), 0, 0, 100000)
+        self.__readbatch.set_help(
+            _(
+                "Read the objects of the Attributes section in a background "
+                "thread, this many at a time, while the rows are processed. "
+                "0 reads them in the report. For database servers; SQLite "
+                "trees are always read in the report."
+            )
+        )
+        menu.add_option(category_name, "readbatch", self.__readbatch)
+
+        self.__readdepth = NumberOption(_("Read-ahead queue depth"), 4, 1, 64)
+        self.__readdepth.set_help(
+            _("Number of batches read ahead of the rows being processed")
+        )
+        menu.add_option(category_name, "readdepth", self.__readdepth)
+
+        self.__profile_file = StringOption(_("Profile file"), "")
+        self.__profile_file.set_help(
+            _(
+                "When set, the run is profiled with cProfile and the statistics "
+                "are saved to this file"
+            )
+        )
+        menu.add_option(category_name, "profilefile", self.__profile_file)
+
         self.__add_menu_meta(menu)
 
     def __update_filters(self):
@@ -573,21 +2562,71 @@ class report_templateOptions(MenuReportOptions):
             # The other filters need a center person (assume custom ones too)
             self.__pid.set_available(True)
 
+    def __style_changed(self):
+        """
+        Handle style change. The output file is only used by the formats
+        written directly to a file, the index page only by the table format
+        """
+        style = self.__sel2_option.get_value()
+        self.__outfile.set_available(style in FILE_STYLES)
+        self.__indexpage.set_available(style == STYLE_ENTRY[0])
+
     def __property_changed(self):
         """
         Handle property change.
             If the property is not Census Report, disable the Census options visibility
-            If the property is an Attribute Report, disable the Person filter visibility
+            If the property is an Attribute Report, the Person filter is only
+            visible when the scan is limited to the filtered people
         """
         property_value = self.__sel1_option.get_value()
+        self.__aggregate_changed()
         if (
             property_value == list(PROPERTY_ENTRY)[0]
-        ):  # "Attribute Report is the only report that does not use a Person filter"
-            self.__filter.set_available(False)
-            self.__pid.set_available(False)
+        ):  # "Attribute Report is the only report that may not use a Person filter"
+            self.__attrscope.set_available(True)
+            if self.__attrscope.get_value() == ATTRIBUTE_SCOPE[0]:
+                self.__filter.set_available(False)
+                self.__pid.set_available(False)
+                return
         else:
-            self.__filter.set_available(True)
-            self.__filter_changed()
+            self.__attrscope.set_available(False)
+        self.__filter.set_available(True)
+        self.__filter_changed()
+
+    def __aggregate_changed(self):
+        """
+        Grouping by period and place levels apply to Birth and Death, the
+        date range also to the Full List.
+        """
+        if self.__aggregate is None:
+            self.__set_sort_columns()
+            return
+        property_value = self.__sel1_option.get_value()
+        birth_death = property_value in list(PROPERTY_ENTRY)[2:4]
+        self.__aggregate.set_available(birth_death)
+        self.__placelevel.set_available(birth_death)
+        dated = property_value in list(PROPERTY_ENTRY)[2:5]
+        self.__datefrom.set_available(dated)
+        self.__dateto.set_available(dated)
+        self.__set_sort_columns()
+
+    def __set_sort_columns(self):
+        """The Sort by choices are the columns of the selected section."""
+        if self.__sortkey is None:
+            return
+        property_value = self.__sel1_option.get_value()
+        headers = PROPERTY_ENTRY[property_value]
+        if (
+            self.__aggregate is not None
+            and property_value in list(PROPERTY_ENTRY)[2:4]
+            and self.__aggregate.get_value() in PERIOD_YEARS
+        ):
+            headers = AGGREGATE_HEADERS
+        items = [(0, _(SORT_DEFAULT))]
+        items.extend((i + 1, _(header)) for i, header in enumerate(headers))
+        self.__sortkey.set_items(items)
+        if self.__sortkey.get_value() >= len(items):
+            self.__sortkey.set_value(0)
 
     #
     # The style sheet for the attributes
@@ -614,6 +2653,18 @@ class report_templateOptions(MenuReportOptions):
         p.set_description(_("The style used for the title."))
         default_style.add_paragraph_style("Sample-Attribute-Title", p)
 
+        font = FontStyle()
+        font.set_size(10)
+        font.set_type_face(FONT_SANS_SERIF)
+        font.set_bold(True)
+        p = ParagraphStyle()
+        p.set_header_level(2)
+        p.set_font(font)
+        p.set_top_margin(utils.pt2cm(3))
+        p.set_bottom_margin(utils.pt2cm(3))
+        p.set_description(_("The style used for the headings of the parts."))
+        default_style.add_paragraph_style("Sample-Attribute-Part", p)
+
         font = FontStyle()
         font.set_size(my_font_size)
         p = ParagraphStyle()
@@ -650,15 +2701,14 @@ class report_templateOptions(MenuReportOptions):
         cell = TableCellStyle()
         default_style.add_cell_style("Sample-Attribute-TableCell", cell)
 
-        table = TableStyle()
-        table.set_width(100)
-        table.set_columns(5)
-        table.set_column_width(0, 12)
-        table.set_column_width(1, 8)
-        table.set_column_width(2, 20)
-        table.set_column_width(3, 25)
-        table.set_column_width(4, 35)
-        default_style.add_table_style("Sample-Attribute-Table", table)
+        # one table style for each number of columns of the sections
+        for columns, widths in TABLE_COLUMNS.items():
+            table = TableStyle()
+            table.set_width(100)
+            table.set_columns(columns)
+            for column, width in enumerate(widths):
+                table.set_column_width(column, width)
+            default_style.add_table_style(_table_style(columns), table)
 
     def __add_menu_meta(self, menu):
         category_name = _("Report Stats")
@@ -671,4 +2721,9 @@ class report_templateOptions(MenuReportOptions):
         self.__footer_tree = BooleanOption(_("Show Gramps Tree"), False)
         self.__footer_tree.set_help(_("Show Gramps Tree name at end of report"))
         menu.add_option(category_name, "footertree", self.__footer_tree)
+        self.__footer_stats = BooleanOption(_("Show Phase Timings"), False)
+        self.__footer_stats.set_help(
+            _("Show the time spent in each phase of the report at end of report")
+        )
+        menu.add_option(category_name, "footerstats", self.__footer_stats)
         self.__update_filters()
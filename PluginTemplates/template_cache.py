@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Database proxy with a bounded object cache per object type"""
+#
+# CacheProxyDb keeps the objects of all types in one LRU cache.  This proxy
+# gives each object type its own LRU cache with its own size, so a report
+# can cache the objects it reads again and nothing else, and it counts the
+# hits and misses of every type.
+#
+# ------------------------------------------------------------------------
+#
+# Gramps modules
+#
+# ------------------------------------------------------------------------
+from gramps.gen.utils.lru import LRU
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+OBJECT_TYPES = (
+    "Person",
+    "Family",
+    "Event",
+    "Place",
+    "Citation",
+    "Source",
+    "Repository",
+    "Media",
+    "Note",
+    "Tag",
+)
+DEFAULT_SIZE = 20000  # objects cached per type
+
+
+# ------------------------------------------------------------------------
+#
+# BoundedCacheDb
+#
+# ------------------------------------------------------------------------
+class BoundedCacheDb:
+    """
+    Read-only database proxy caching the objects fetched by handle.
+
+    sizes maps an object type to the maximum number of cached objects of
+    that type; the types not in sizes get default entries, and a size of 0
+    or 1 disables the cache of a type.  All other methods go to the database.
+    """
+
+    def __init__(self, database, sizes=None, default=DEFAULT_SIZE):
+        self.db = database
+        self.__sizes = {}
+        self.__caches = {}
+        self.__counts = {}
+        for obj_type in OBJECT_TYPES:
+            size = default if sizes is None else sizes.get(obj_type, default)
+            self.__sizes[obj_type] = size
+            self.__counts[obj_type] = [0, 0]
+            # the LRU is disabled below 2 entries
+            self.__caches[obj_type] = LRU(size) if size > 1 else None
+            method = "get_%s_from_handle" % obj_type.lower()
+            setattr(self, method, self.__getter(obj_type, getattr(database, method)))
+
+    def __getattr__(self, attr):
+        return getattr(self.db, attr)
+
+    def __getter(self, obj_type, fetch):
+        cache = self.__caches[obj_type]
+        counts = self.__counts[obj_type]
+        if cache is None:
+
+            def get(handle):
+                counts[1] += 1
+                return fetch(handle)
+
+        else:
+
+            def get(handle):
+                if handle in cache:
+                    counts[0] += 1
+                    return cache[handle]
+                counts[1] += 1
+                obj = cache[handle] = fetch(handle)
+                return obj
+
+        return get
+
+    def clear_cache(self, handle=None):
+        """Drop an object, or all objects, from the caches."""
+        for cache in self.__caches.values():
+            if cache is None:
+                continue
+            if handle is None:
+                cache.clear()
+            elif handle in cache:
+                del cache[handle]
+
+    def stats(self):
+        """
+        Return a dict of object type to a dict of the cache size, the number
+        of hits and misses, the entries in the cache and the evictions.
+        Only the types that were read are reported.
+        """
+        stats = {}
+        for obj_type in OBJECT_TYPES:
+            hits, misses = self.__counts[obj_type]
+            if not hits and not misses:
+                continue
+            cache = self.__caches[obj_type]
+            entries = evictions = 0
+            if cache is not None:
+                entries = len(cache.data)
+                evictions = max(0, misses - entries)
+            stats[obj_type] = {
+                "size": self.__sizes[obj_type],
+                "hits": hits,
+                "misses": misses,
+                "entries": entries,
+                "evictions": evictions,
+            }
+        return stats
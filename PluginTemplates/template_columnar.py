@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Columnar file format for the rows of the sample report"""
+#
+# A small typed, column oriented file format that only needs the standard
+# library.  The report writes it; downstream tools read it back with
+# read_columns() without parsing CSV text.
+#
+# Layout (all integers little endian):
+#
+#   MAGIC
+#   uint32 header length, JSON header {"columns": [[name, type], ...]}
+#   row groups, each:
+#       uint32 number of rows (0 ends the file)
+#       for each column: uint32 length, zlib compressed column block
+#
+# Column types:
+#   "str"   uint32 count and byte lengths, followed by the UTF-8 text
+#   "dict"  dictionary encoded strings: uint32 count of new dictionary
+#           entries, their lengths and text, then uint32 codes per row.
+#           The dictionary grows from one row group to the next.
+#   "int"   int64 values
+#
+# ------------------------------------------------------------------------
+#
+# standard python modules
+#
+# ------------------------------------------------------------------------
+from array import array
+import json
+import struct
+import sys
+import zlib
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+MAGIC = b"GRAMPSCOL1\n"
+COLUMN_TYPES = "str", "dict", "int"
+ROW_GROUP_SIZE = 65536
+_UINT32 = struct.Struct("<I")
+
+
+def _le(values):
+    """Return the little endian bytes of an array."""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _pack_strings(strings):
+    encoded = [string.encode("utf-8") for string in strings]
+    lengths = array("I", map(len, encoded))
+    return _UINT32.pack(len(encoded)) + _le(lengths) + b"".join(encoded)
+
+
+def _unpack_strings(data, offset=0):
+    (count,) = _UINT32.unpack_from(data, offset)
+    offset += 4
+    lengths = _from_le("I", data[offset : offset + 4 * count])
+    offset += 4 * count
+    strings = []
+    for length in lengths:
+        strings.append(data[offset : offset + length].decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+# ------------------------------------------------------------------------
+#
+# ColumnarWriter
+#
+# ------------------------------------------------------------------------
+class ColumnarWriter:
+    """
+    Write rows to a columnar file, one row group at a time, so only the
+    current row group is held in memory.
+    """
+
+    def __init__(self, output, columns, row_group_size=ROW_GROUP_SIZE):
+        """
+        output: binary file object
+        columns: list of (name, type) pairs, type one of COLUMN_TYPES
+        """
+        for name, column_type in columns:
+            if column_type not in COLUMN_TYPES:
+                raise ValueError("unknown column type %s for %s" % (column_type, name))
+        self.__output = output
+        self.__types = [column_type for name, column_type in columns]
+        self.__group_size = row_group_size
+        self.__group = [[] for column in columns]
+        self.__dictionaries = [{} for column in columns]
+        header = json.dumps({"columns": [list(column) for column in columns]})
+        header = header.encode("utf-8")
+        output.write(MAGIC + _UINT32.pack(len(header)) + header)
+
+    def writerow(self, row):
+        for values, value in zip(self.__group, row):
+            values.append(value)
+        if len(self.__group[0]) >= self.__group_size:
+            self.__flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def __flush(self):
+        count = len(self.__group[0])
+        if not count:
+            return
+        self.__output.write(_UINT32.pack(count))
+        for index, values in enumerate(self.__group):
+            block = zlib.compress(self.__encode(index, values))
+            self.__output.write(_UINT32.pack(len(block)) + block)
+        self.__group = [[] for values in self.__group]
+
+    def __encode(self, index, values):
+        column_type = self.__types[index]
+        if column_type == "int":
+            return _le(array("q", values))
+        if column_type == "str":
+            return _pack_strings(values)
+        dictionary = self.__dictionaries[index]
+        new = []
+        codes = array("I")
+        for value in values:
+            code = dictionary.get(value)
+            if code is None:
+                code = dictionary[value] = len(dictionary)
+                new.append(value)
+            codes.append(code)
+        return _pack_strings(new) + _le(codes)
+
+    def close(self):
+        """Write the last row group and the end marker."""
+        self.__flush()
+        self.__output.write(_UINT32.pack(0))
+
+
+# ------------------------------------------------------------------------
+#
+# Loader
+#
+# ------------------------------------------------------------------------
+def read_columns(path, decode=True):
+    """
+    Read a columnar file. Returns a dict of column name to values, in the
+    column order of the file.
+
+    With decode=False, "dict" columns are returned as (codes, dictionary)
+    pairs, which is what analytics usually want for grouping.
+    "int" columns are arrays of int64.
+    """
+    with open(path, "rb") as source:
+        if source.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a columnar report file" % path)
+        (length,) = _UINT32.unpack(source.read(4))
+        columns = json.loads(source.read(length).decode("utf-8"))["columns"]
+        values = []
+        for name, column_type in columns:
+            if column_type == "int":
+                values.append(array("q"))
+            elif column_type == "dict":
+                values.append(array("I"))
+            else:
+                values.append([])
+        dictionaries = [[] for column in columns]
+        while True:
+            (count,) = _UINT32.unpack(source.read(4))
+            if not count:
+                break
+            for index, (name, column_type) in enumerate(columns):
+                (length,) = _UINT32.unpack(source.read(4))
+                data = zlib.decompress(source.read(length))
+                if column_type == "int":
+                    values[index].extend(_from_le("q", data))
+                elif column_type == "str":
+                    strings, offset = _unpack_strings(data)
+                    values[index].extend(strings)
+                else:
+                    new, offset = _unpack_strings(data)
+                    dictionaries[index].extend(new)
+                    values[index].extend(_from_le("I", data[offset:]))
+    result = {}
+    for index, (name, column_type) in enumerate(columns):
+        if column_type == "dict":
+            if decode:
+                dictionary = dictionaries[index]
+                result[name] = [dictionary[code] for code in values[index]]
+            else:
+                result[name] = (values[index], dictionaries[index])
+        else:
+            result[name] = values[index]
+    return result
+
+
+def iter_rows(path):
+    """Yield the rows of a columnar file as tuples."""
+    columns = read_columns(path)
+    return zip(*columns.values())
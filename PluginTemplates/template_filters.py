@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Person filter results shared by the Sample Gramplet and the Sample Report"""
+#
+# Evaluating a rule tree over a large tree can take a long time.  The result
+# of a filter is cached, keyed on the filter name and definition, the center
+# person and the changes made to the database, so running the same filter
+# again (another report section, another gramplet update) only costs a
+# lookup.  The results are kept up to a total number of handles.
+#
+# ------------------------------------------------------------------------
+#
+# standard python modules
+#
+# ------------------------------------------------------------------------
+from collections import OrderedDict
+import hashlib
+import itertools
+import weakref
+
+# ------------------------------------------------------------------------
+#
+# Gramps modules
+#
+# ------------------------------------------------------------------------
+from gramps.gen.proxy import CacheProxyDb
+from template_cache import BoundedCacheDb
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+MAX_HANDLES = 1000000  # handles kept over all the cached results
+#
+# Signals of the objects a filter rule may look at. Batch transactions do
+# not emit the add, update and delete signals, only rebuild ones.
+#
+CHANGE_SIGNALS = [
+    "%s-%s" % (obj, action)
+    for obj in (
+        "person",
+        "family",
+        "event",
+        "place",
+        "source",
+        "citation",
+        "repository",
+        "media",
+        "note",
+        "tag",
+    )
+    for action in ("add", "update", "delete", "rebuild")
+]
+
+_RESULTS = OrderedDict()
+_HANDLES = [0]  # handles in _RESULTS
+_COUNTERS = weakref.WeakKeyDictionary()
+_GENERATIONS = itertools.count()
+
+
+def _database(database):
+    """The database that emits the change signals."""
+    while isinstance(database, (CacheProxyDb, BoundedCacheDb)):
+        database = database.db
+    return database
+
+
+def change_counter(database):
+    """
+    Return (generation, changes, commits): a number unique to the open
+    database, the number of changes signalled since it was first seen, and
+    the commits the database counts itself, batch transactions included,
+    when it does. Counting starts by connecting to the change signals.
+    """
+    database = _database(database)
+    counter = _COUNTERS.get(database)
+    if counter is None:
+        counter = _COUNTERS[database] = [next(_GENERATIONS), 0]
+
+        def changed(*args):
+            counter[1] += 1
+
+        for signal in CHANGE_SIGNALS:
+            database.connect(signal, changed)
+    return tuple(counter) + (getattr(database, "has_changed", None),)
+
+
+def _definition(generic_filter, seen):
+    """
+    The logic and rules of a filter, with the definitions of the custom
+    filters its rules refer to (MatchesFilter and the like).
+    """
+    rules = []
+    for rule in generic_filter.get_rules():
+        referenced = None
+        if hasattr(rule, "find_filter"):
+            found = rule.find_filter()
+            if found is not None and id(found) not in seen:
+                referenced = _definition(found, seen | {id(found)})
+        rules.append(
+            (
+                type(rule).__module__,
+                type(rule).__name__,
+                tuple(rule.list),
+                getattr(rule, "use_regex", False),
+                getattr(rule, "use_case", False),
+                referenced,
+            )
+        )
+    return (generic_filter.get_logical_op(), generic_filter.get_invert(), rules)
+
+
+def filter_signature(person_filter):
+    """Hash of the definition of a filter and of the filters it refers to."""
+    definition = _definition(person_filter, {id(person_filter)})
+    return hashlib.sha1(repr(definition).encode("utf-8")).hexdigest()
+
+
+def _key(database, person_filter, center):
+    return (
+        person_filter.get_name(),
+        filter_signature(person_filter),
+        center,
+        change_counter(database),
+        database.get_number_of_people(),
+    )
+
+
+def lookup(database, person_filter, center=None):
+    """
+    Return the cached handles matching the filter, as a sorted tuple, or
+    None when the filter has to be evaluated.
+    """
+    key = _key(database, person_filter, center)
+    result = _RESULTS.get(key)
+    if result is not None:
+        _RESULTS.move_to_end(key)
+    return result
+
+
+def store(database, person_filter, handles, center=None):
+    """
+    Cache the handles matching the filter, dropping the least recently
+    used results over MAX_HANDLES. Returns the handles as stored.
+    """
+    result = tuple(sorted(handles))
+    if len(result) > MAX_HANDLES:
+        return result
+    key = _key(database, person_filter, center)
+    previous = _RESULTS.pop(key, None)
+    if previous is not None:
+        _HANDLES[0] -= len(previous)
+    _RESULTS[key] = result
+    _HANDLES[0] += len(result)
+    while _HANDLES[0] > MAX_HANDLES:
+        dummy, dropped = _RESULTS.popitem(last=False)
+        _HANDLES[0] -= len(dropped)
+    return result
+
+
+def iter_apply(database, person_filter, handles, matches, chunk_size):
+    """
+    Generator that checks the handles against the filter one chunk at a
+    time, adding the handles that match to the matches list. Yields the
+    number of handles checked so far, so callers can report progress or
+    give control back to the GUI; closing it stops the evaluation.
+    """
+    check = person_filter.get_check_func()
+    for rule in person_filter.get_rules():
+        rule.requestprepare(database, None)
+    try:
+        for start in range(0, len(handles), chunk_size):
+            matches.extend(check(database, handles[start : start + chunk_size]))
+            yield min(start + chunk_size, len(handles))
+    finally:
+        # also runs when an interrupted run is closed
+        for rule in person_filter.get_rules():
+            rule.requestreset()
+
+
+def apply_filter(database, person_filter, user=None, center=None):
+    """
+    Apply a person filter to the whole database, or take its result from
+    the cache. Returns the matching handles as a sorted tuple.
+    """
+    result = lookup(database, person_filter, center)
+    if result is None:
+        handles = person_filter.apply(
+            database, database.iter_person_handles(), user=user
+        )
+        result = store(database, person_filter, handles, center)
+    return result
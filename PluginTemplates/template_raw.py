@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Read fields of serialized Gramps objects without building the objects"""
+#
+# Database cursors return the serialized form of the objects: a tuple in
+# Gramps 5, a JSON dict in Gramps 6.  The accessors below read the few
+# fields a scan needs straight from that form.  Fields are named after the
+# attributes of the Gramps objects, which are also the keys of the JSON
+# form.  When a tuple does not have a known layout, the accessor falls back
+# to unserializing the whole object and reading its attributes.
+#
+# ------------------------------------------------------------------------
+#
+# standard python modules
+#
+# ------------------------------------------------------------------------
+import logging
+
+# ------------------------------------------------------------------------
+#
+# Gramps modules
+#
+# ------------------------------------------------------------------------
+from gramps.gen.lib import (
+    AttributeType,
+    Citation,
+    Event,
+    EventType,
+    Family,
+    Media,
+    Name,
+    Person,
+    Place,
+)
+
+try:
+    from gramps.gen.lib.json_utils import data_to_object
+except ImportError:
+    # Gramps 5 has no JSON form
+    data_to_object = None
+
+LOG = logging.getLogger(".template_raw")
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+#
+# Slots of the serialized tuples, per object type and tuple length
+#
+TUPLE_SLOTS = {
+    "Person": {
+        21: {
+            "gramps_id": 1,
+            "primary_name": 3,
+            "event_ref_list": 7,
+            "family_list": 8,
+            "media_list": 10,
+            "attribute_list": 12,
+            "change": 17,
+            "person_ref_list": 20,
+        },
+    },
+    "Family": {
+        15: {
+            "gramps_id": 1,
+            "father_handle": 2,
+            "mother_handle": 3,
+            "event_ref_list": 6,
+            "media_list": 7,
+            "attribute_list": 8,
+            "change": 12,
+        },
+    },
+    "Event": {
+        13: {
+            "gramps_id": 1,
+            "type": 2,
+            "date": 3,
+            "description": 4,
+            "citation_list": 6,
+            "media_list": 8,
+            "attribute_list": 9,
+            "change": 10,
+        },
+    },
+    "Media": {
+        13: {
+            "gramps_id": 1,
+            "desc": 4,
+            "attribute_list": 6,
+            "change": 9,
+        },
+    },
+    "Citation": {12: {"gramps_id": 1, "change": 9}},
+    "Place": {18: {"gramps_id": 1, "change": 15}},
+}
+#
+# Slots of the tuples of secondary objects
+#
+REF_HANDLE = 4  # EventRef, MediaRef
+PERSONREF_CITATIONS = 1
+PERSONREF_HANDLE = 3
+ATTR_TYPE = 3
+ATTR_VALUE = 4
+DATE_SORTVAL = 5
+
+OBJECT_CLASSES = {
+    "Person": Person,
+    "Family": Family,
+    "Event": Event,
+    "Media": Media,
+    "Citation": Citation,
+    "Place": Place,
+}
+
+
+# ------------------------------------------------------------------------
+#
+# Accessors
+#
+# ------------------------------------------------------------------------
+class _TupleFields:
+    """Fields of a serialized tuple with a known layout."""
+
+    def __init__(self, slots):
+        self.__slots = slots
+
+    def value(self, raw, field):
+        return raw[self.__slots[field]]
+
+    def ref_handles(self, raw, field):
+        return [ref[REF_HANDLE] for ref in raw[self.__slots[field]]]
+
+    def attributes(self, raw):
+        """(AttributeType, value) pairs of the attribute list."""
+        return [
+            (AttributeType().unserialize(attr[ATTR_TYPE]), attr[ATTR_VALUE])
+            for attr in raw[self.__slots["attribute_list"]]
+        ]
+
+    def person_refs(self, raw):
+        """(person handle, citation handles) pairs of the associations."""
+        return [
+            (ref[PERSONREF_HANDLE], ref[PERSONREF_CITATIONS])
+            for ref in raw[self.__slots["person_ref_list"]]
+        ]
+
+    def event_type(self, raw):
+        return EventType().unserialize(raw[self.__slots["type"]])
+
+    def date_sortval(self, raw):
+        """Sort value of the date, 0 for no valid date."""
+        return raw[self.__slots["date"]][DATE_SORTVAL]
+
+    def primary_name(self, raw):
+        return Name().unserialize(raw[self.__slots["primary_name"]])
+
+
+class _JsonFields:
+    """Fields of a JSON dict."""
+
+    def value(self, raw, field):
+        return raw[field]
+
+    def ref_handles(self, raw, field):
+        return [ref["ref"] for ref in raw[field]]
+
+    def attributes(self, raw):
+        return [
+            (
+                AttributeType((attr["type"]["value"], attr["type"]["string"])),
+                attr["value"],
+            )
+            for attr in raw["attribute_list"]
+        ]
+
+    def person_refs(self, raw):
+        return [(ref["ref"], ref["citation_list"]) for ref in raw["person_ref_list"]]
+
+    def event_type(self, raw):
+        return EventType((raw["type"]["value"], raw["type"]["string"]))
+
+    def date_sortval(self, raw):
+        return raw["date"]["sortval"]
+
+    def primary_name(self, raw):
+        return data_to_object(raw["primary_name"])
+
+
+class _ObjectFields:
+    """
+    Fields of an unknown serialized form, read from the unserialized
+    object.  The last object is kept, as a scan reads several fields of
+    the same row.
+    """
+
+    def __init__(self, object_class):
+        self.__class = object_class
+        self.__raw = None
+        self.__object = None
+
+    def __get(self, raw):
+        if raw is not self.__raw:
+            if isinstance(raw, dict):
+                self.__object = data_to_object(raw)
+            else:
+                self.__object = self.__class().unserialize(raw)
+            self.__raw = raw
+        return self.__object
+
+    def value(self, raw, field):
+        return getattr(self.__get(raw), field)
+
+    def ref_handles(self, raw, field):
+        return [ref.ref for ref in getattr(self.__get(raw), field)]
+
+    def attributes(self, raw):
+        return [
+            (attr.get_type(), attr.get_value())
+            for attr in self.__get(raw).get_attribute_list()
+        ]
+
+    def person_refs(self, raw):
+        return [
+            (ref.ref, ref.get_citation_list())
+            for ref in self.__get(raw).get_person_ref_list()
+        ]
+
+    def event_type(self, raw):
+        return self.__get(raw).get_type()
+
+    def date_sortval(self, raw):
+        return self.__get(raw).get_date_object().get_sort_value()
+
+    def primary_name(self, raw):
+        return self.__get(raw).get_primary_name()
+
+
+_JSON = _JsonFields()
+_ACCESSORS = {}
+
+
+def fields(obj_type, raw):
+    """
+    Return the accessor of the fields of a serialized object of the given
+    type ("Person", "Family", "Event", "Media", "Citation" or "Place").
+    """
+    if isinstance(raw, dict):
+        return _JSON
+    key = (obj_type, len(raw))
+    accessor = _ACCESSORS.get(key)
+    if accessor is None:
+        slots = TUPLE_SLOTS[obj_type].get(len(raw))
+        if slots is not None:
+            accessor = _TupleFields(slots)
+        else:
+            LOG.warning(
+                "unknown %s layout of %d fields, objects are unserialized",
+                obj_type,
+                len(raw),
+            )
+            accessor = _ObjectFields(OBJECT_CLASSES[obj_type])
+        _ACCESSORS[key] = accessor
+    return accessor
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Gramps - a GTK+/GNOME based genealogy program
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""Benchmarks of the Sample Report and the Sample Gramplet filter path"""
+#
+# Generates synthetic trees in the SQLite backend, then runs every section
+# of the Sample Report in the selected formats, and the person filter path
+# of the Sample Gramplet, each in a fresh process.  Wall time, peak RSS and
+# the timings of the phases are written to a JSON file, so runs of different
+# versions can be compared.
+#
+# Usage:
+#   python3 benchmarks/bench_templates.py --sizes 10000 100000 \
+#       --workdir /tmp/bench --output results.json
+#
+# Gramps must be importable; the trees are kept in the work directory and
+# reused by later runs of the same size.
+#
+# With --check, every section is run in every format on a small tree, and
+# the exit code is non-zero when a report failed:
+#   python3 benchmarks/bench_templates.py --check --workdir /tmp/bench
+#
+# ------------------------------------------------------------------------
+#
+# standard python modules
+#
+# ------------------------------------------------------------------------
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+PLUGIN_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PluginTemplates"
+)
+sys.path.insert(0, PLUGIN_DIR)
+
+# ------------------------------------------------------------------------
+#
+# Gramps modules
+#
+# ------------------------------------------------------------------------
+from gramps.gen.const import VERSION
+from gramps.gen.db import DbTxn
+from gramps.gen.db.dbconst import DBMODE_R
+from gramps.gen.db.utils import make_database
+from gramps.gen.lib import (
+    Attribute,
+    AttributeType,
+    ChildRef,
+    Citation,
+    Date,
+    Event,
+    EventRef,
+    EventType,
+    Family,
+    Name,
+    Person,
+    PersonRef,
+    Place,
+    PlaceName,
+    PlaceRef,
+    PlaceType,
+    Source,
+    Surname,
+)
+from gramps.gen.utils.id import create_id
+
+# ------------------------------------------------------------------------
+#
+# Constants
+#
+# ------------------------------------------------------------------------
+SIZES = 10000, 100000, 1000000
+STYLES = "Table format", "CSV format"
+CHECK_SIZE = 500  # people of the tree of a --check run
+TXN_PEOPLE = 10000  # people added per batch transaction
+COMPLETE_MARKER = "benchmark-tree"  # written once a tree is fully generated
+#
+# Fan-out of the synthetic trees
+#
+PEOPLE_PER_PARISH = 200
+PARISHES_PER_COUNTY = 20
+COUNTIES_PER_COUNTRY = 10
+SOURCES = 50
+CITATIONS_PER_EVENT = 0, 1, 1, 2
+ATTRIBUTES_PER_PERSON = 0, 0, 1, 2
+ATTRIBUTES_PER_FAMILY = 0, 1
+CHILDREN_PER_FAMILY = 0, 1, 2, 3, 4
+DEATH_RATE = 0.7
+BAPTISM_RATE = 0.5
+ASSOCIATION_RATE = 0.05  # share of people with associates
+ASSOCIATES = 500  # the godparents/witnesses shared by many people
+FIRST_NAMES = "Anna", "Maria", "Johan", "Karl", "Erik", "Lena", "Olof", "Greta"
+SURNAMES = "Berg", "Lind", "Holm", "Nyberg", "Sund", "Ek", "Dahl", "Strand"
+ATTRIBUTE_TYPES = (
+    AttributeType.OCCUPATION,
+    AttributeType.NICKNAME,
+    AttributeType.NATIONAL,
+    AttributeType.DESCRIPTION,
+)
+
+
+# ------------------------------------------------------------------------
+#
+# Synthetic trees
+#
+# ------------------------------------------------------------------------
+class TreeGenerator:
+    """Add a synthetic tree of the given number of people to a database."""
+
+    def __init__(self, database, people, seed=1):
+        self.db = database
+        self.people = people
+        self.random = random.Random(seed)
+        self.parishes = []
+        self.citations = []
+        self.associates = []
+
+    def generate(self):
+        with DbTxn("Benchmark places", self.db, batch=True) as trans:
+            self.__add_places(trans)
+            self.__add_sources(trans)
+        count = 0
+        while count < self.people:
+            with DbTxn("Benchmark people", self.db, batch=True) as trans:
+                target = min(self.people, count + TXN_PEOPLE)
+                while count < target:
+                    count += self.__add_household(trans)
+
+    def __place(self, name, place_type, parent, trans):
+        place = Place()
+        place_name = PlaceName()
+        place_name.set_value(name)
+        place.set_name(place_name)
+        place.set_type(place_type)
+        if parent:
+            placeref = PlaceRef()
+            placeref.set_reference_handle(parent)
+            place.add_placeref(placeref)
+        return self.db.add_place(place, trans)
+
+    def __add_places(self, trans):
+        parishes = max(1, self.people // PEOPLE_PER_PARISH)
+        counties = max(1, parishes // PARISHES_PER_COUNTY)
+        countries = max(1, counties // COUNTIES_PER_COUNTRY)
+        country_handles = [
+            self.__place("Country %d" % i, PlaceType.COUNTRY, None, trans)
+            for i in range(countries)
+        ]
+        county_handles = [
+            self.__place(
+                "County %d" % i, PlaceType.COUNTY, country_handles[i % countries], trans
+            )
+            for i in range(counties)
+        ]
+        self.parishes = [
+            self.__place(
+                "Parish %d" % i, PlaceType.PARISH, county_handles[i % counties], trans
+            )
+            for i in range(parishes)
+        ]
+
+    def __add_sources(self, trans):
+        for i in range(SOURCES):
+            source = Source()
+            source.set_title("Parish register %d" % i)
+            source_handle = self.db.add_source(source, trans)
+            for page in range(20):
+                citation = Citation()
+                citation.set_reference_handle(source_handle)
+                citation.set_page("p. %d" % page)
+                self.citations.append(self.db.add_citation(citation, trans))
+
+    def __event(self, person, event_type, year, parish, trans):
+        event = Event()
+        event.set_type(event_type)
+        date = Date()
+        date.set_yr_mon_day(
+            year, self.random.randint(1, 12), self.random.randint(1, 28)
+        )
+        event.set_date_object(date)
+        event.set_place_handle(parish)
+        for dummy in range(self.random.choice(CITATIONS_PER_EVENT)):
+            event.add_citation(self.random.choice(self.citations))
+        event_ref = EventRef()
+        event_ref.set_reference_handle(self.db.add_event(event, trans))
+        person.add_event_ref(event_ref)
+        return event_ref
+
+    def __attributes(self, obj, choices):
+        for dummy in range(self.random.choice(choices)):
+            attr = Attribute()
+            attr.set_type(self.random.choice(ATTRIBUTE_TYPES))
+            attr.set_value("value %d" % self.random.randint(1, 1000))
+            obj.add_attribute(attr)
+
+    def __person(self, gender, year, parish, trans):
+        person = Person()
+        person.set_gender(gender)
+        name = Name()
+        name.set_first_name(self.random.choice(FIRST_NAMES))
+        surname = Surname()
+        surname.set_surname(self.random.choice(SURNAMES))
+        name.add_surname(surname)
+        person.set_primary_name(name)
+        person.set_birth_ref(self.__event(person, EventType.BIRTH, year, parish, trans))
+        if self.random.random() < BAPTISM_RATE:
+            self.__event(person, EventType.BAPTISM, year, parish, trans)
+        if self.random.random() < DEATH_RATE:
+            death = self.__event(
+                person,
+                EventType.DEATH,
+                year + self.random.randint(0, 90),
+                self.random.choice(self.parishes),
+                trans,
+            )
+            person.set_death_ref(death)
+        self.__attributes(person, ATTRIBUTES_PER_PERSON)
+        if self.associates and self.random.random() < ASSOCIATION_RATE:
+            for dummy in range(self.random.randint(1, 3)):
+                person_ref = PersonRef()
+                person_ref.set_reference_handle(self.random.choice(self.associates))
+                person_ref.set_relation("Godparent")
+                person_ref.add_citation(self.random.choice(self.citations))
+                person.add_person_ref(person_ref)
+        return person
+
+    def __add_household(self, trans):
+        parish = self.random.choice(self.parishes)
+        year = self.random.randint(1700, 1900)
+        father = self.__person(Person.MALE, year, parish, trans)
+        mother = self.__person(Person.FEMALE, year + 2, parish, trans)
+        children = [
+            self.__person(
+                self.random.choice((Person.MALE, Person.FEMALE)),
+                year + 25 + i * 2,
+                parish,
+                trans,
+            )
+            for i in range(self.random.choice(CHILDREN_PER_FAMILY))
+        ]
+        family = Family()
+        family.set_handle(create_id())
+        self.__attributes(family, ATTRIBUTES_PER_FAMILY)
+        father.add_family_handle(family.get_handle())
+        mother.add_family_handle(family.get_handle())
+        father_handle = self.db.add_person(father, trans)
+        family.set_father_handle(father_handle)
+        family.set_mother_handle(self.db.add_person(mother, trans))
+        for child in children:
+            child.add_parent_family_handle(family.get_handle())
+            child_ref = ChildRef()
+            child_ref.set_reference_handle(self.db.add_person(child, trans))
+            family.add_child_ref(child_ref)
+        self.db.add_family(family, trans)
+        if len(self.associates) < ASSOCIATES:
+            self.associates.append(father_handle)
+        return 2 + len(children)
+
+
+def tree_path(workdir, people):
+    """Create the tree of the given size unless it exists; return its path."""
+    path = os.path.join(workdir, "tree-%d" % people)
+    complete = os.path.join(path, COMPLETE_MARKER)
+    if os.path.isfile(complete):
+        return path
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "name.txt"), "w") as name_file:
+        name_file.write("Benchmark %d" % people)
+    with open(os.path.join(path, "database.txt"), "w") as dbid_file:
+        dbid_file.write("sqlite")
+    database = make_database("sqlite")
+    database.load(path)
+    start = time.perf_counter()
+    TreeGenerator(database, people).generate()
+    print("generated %s in %.1fs" % (path, time.perf_counter() - start))
+    database.close()
+    with open(complete, "w") as marker:
+        marker.write(str(people))
+    return path
+
+
+# ------------------------------------------------------------------------
+#
+# Cases. Each one runs in a fresh process, for a meaningful peak RSS
+#
+# ------------------------------------------------------------------------
+def _open(path):
+    database = make_database("sqlite")
+    database.load(path, mode=DBMODE_R)
+    return database
+
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _PhaseRecords(logging.Handler):
+    """Keep the phase timings the report logs at the end of a run."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.phases = {}
+
+    def emit(self, record):
+        self.phases.update(getattr(record, "phases", {}))
+
+
+def run_report_case(path, section, style, outdir, extra=None):
+    """
+    Run a section in a style, with the extra report options. Raises
+    RuntimeError when the report failed or wrote no output, cl_report only
+    prints the error.
+    """
+    from gramps.gen.const import PLUGINS_DIR
+    from gramps.gen.filters import reload_custom_filters
+    from gramps.gen.plug import BasePluginManager
+    from gramps.gen.plug.report import CATEGORY_TEXT
+    from gramps.cli.plug import cl_report
+    from report_template import FILE_STYLES, report_template, report_templateOptions
+
+    phases = {}
+    start = time.perf_counter()
+    BasePluginManager.get_instance().reg_plugins(PLUGINS_DIR, None, None)
+    # the report options list the custom filters, as in the Gramps CLI
+    reload_custom_filters()
+    phases["plugin registration"] = time.perf_counter() - start
+    mark = time.perf_counter()
+    database = _open(path)
+    phases["database open"] = time.perf_counter() - mark
+    name = "%s-%s" % (section, style)
+    options = {
+        "property": section,
+        "style": style,
+        "pid": "I0000",
+        "off": "txt",
+        "of": os.path.join(outdir, name.replace(" ", "_") + ".txt"),
+        "outfile": os.path.join(outdir, name.replace(" ", "_") + ".data"),
+    }
+    options.update(extra or {})
+    records = _PhaseRecords()
+    logger = logging.getLogger(".report_template")
+    logger.addHandler(records)
+    logger.setLevel(logging.INFO)
+    outputs = [options["of"]]
+    if style in FILE_STYLES:
+        outputs.append(options["outfile"])
+    for output in outputs:
+        if os.path.exists(output):
+            os.remove(output)
+    mark = time.perf_counter()
+    try:
+        report = cl_report(
+            database,
+            "sample report",
+            CATEGORY_TEXT,
+            report_template,
+            report_templateOptions,
+            options,
+        )
+    finally:
+        logger.removeHandler(records)
+        database.close()
+    phases["report"] = time.perf_counter() - mark
+    if report is None:
+        raise RuntimeError("%s, %s: the report failed" % (section, style))
+    for output in outputs:
+        if not os.path.isfile(output) or not os.path.getsize(output):
+            raise RuntimeError("%s, %s: %s was not written" % (section, style, output))
+    return {
+        "section": section,
+        "style": style,
+        "options": extra or {},
+        "wall": time.perf_counter() - start,
+        "peak_rss_kb": _peak_rss_kb(),
+        "phases": phases,
+        "report_phases": records.phases,
+    }
+
+
+def run_filter_case(path):
+    from gramps.gen.filters import GenericFilter
+    from gramps.gen.filters.rules.person import IsFemale
+    from template_filters import iter_apply, lookup, store
+
+    phases = {}
+    start = time.perf_counter()
+    database = _open(path)
+    phases["database open"] = time.perf_counter() - start
+    person_filter = GenericFilter()
+    person_filter.set_name("Benchmark females")
+    person_filter.add_rule(IsFemale([]))
+    mark = time.perf_counter()
+    handles = list(database.iter_person_handles())
+    phases["handle list"] = time.perf_counter() - mark
+    mark = time.perf_counter()
+    matches = []
+    for dummy in iter_apply(database, person_filter, handles, matches, 500):
+        pass
+    store(database, person_filter, matches)
+    phases["chunked apply"] = time.perf_counter() - mark
+    mark = time.perf_counter()
+    lookup(database, person_filter)
+    phases["cached lookup"] = time.perf_counter() - mark
+    database.close()
+    return {
+        "section": "Sample Gramplet filter",
+        "style": None,
+        "matches": len(matches),
+        "wall": time.perf_counter() - start,
+        "peak_rss_kb": _peak_rss_kb(),
+        "phases": phases,
+    }
+
+
+def _in_process(function, *args):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--styles", nargs="+", default=list(STYLES))
+    parser.add_argument("--workdir", default="bench-trees")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument(
+        "--options",
+        nargs="+",
+        default=[],
+        metavar="NAME=VALUE",
+        help="report options of every case, for example datefrom=1800",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="run every section in every format on a small tree",
+    )
+    args = parser.parse_args()
+    try:
+        extra = dict(option.split("=", 1) for option in args.options)
+    except ValueError:
+        parser.error("report options are given as NAME=VALUE")
+
+    from report_template import PROPERTY_ENTRY, STYLE_ENTRY
+
+    if args.check:
+        args.sizes = [CHECK_SIZE]
+        args.styles = list(STYLE_ENTRY)
+
+    results = {
+        "gramps_version": VERSION,
+        "python_version": sys.version.split()[0],
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "trees": [],
+    }
+    failed = 0
+    for size in args.sizes:
+        path = tree_path(os.path.abspath(args.workdir), size)
+        outdir = os.path.join(path, "output")
+        os.makedirs(outdir, exist_ok=True)
+        cases = []
+        for section in PROPERTY_ENTRY:
+            for style in args.styles:
+                try:
+                    case = _in_process(
+                        run_report_case, path, section, style, outdir, extra
+                    )
+                except Exception as err:
+                    # no timings for a report that did not run
+                    print("%8d  FAILED %s" % (size, err))
+                    failed += 1
+                    cases.append(
+                        {
+                            "section": section,
+                            "style": style,
+                            "status": "failed",
+                            "error": str(err),
+                        }
+                    )
+                    continue
+                print(
+                    "%8d  %-30s %-14s %8.2fs %8d KB"
+                    % (size, section, style, case["wall"], case["peak_rss_kb"])
+                )
+                case["status"] = "ok"
+                cases.append(case)
+        case = _in_process(run_filter_case, path)
+        print("%8d  %-45s %8.2fs" % (size, case["section"], case["wall"]))
+        cases.append(case)
+        results["trees"].append({"people": size, "cases": cases})
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    if failed:
+        sys.exit("%d report cases failed" % failed)
+
+
+if __name__ == "__main__":
+    main()